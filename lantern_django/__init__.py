@@ -1,10 +1,12 @@
+from django.contrib.postgres.fields import ArrayField
 from django.contrib.postgres.operations import CreateExtension
 from django.contrib.postgres.indexes import PostgresIndex
-from django.db.models import FloatField, Func, Value
+from django.db.models import FloatField, Func, IntegerField, Value
 import numpy as np
+from pgvector.utils import PackedBits, VectorResult, check_ndarray, from_db_bits, to_db_bits, to_packed_bits, validate_batch
 
 
-__all__ = ['LanternExtension', 'LanternExtrasExtension', 'L2Distance', 'CosineDistance', 'HnswIndex']
+__all__ = ['LanternExtension', 'LanternExtrasExtension', 'L2Distance', 'CosineDistance', 'HnswIndex', 'BitVectorField']
 
 
 def to_db(value):
@@ -12,15 +14,16 @@ def to_db(value):
         return value
 
     if isinstance(value, np.ndarray):
-        if value.ndim != 1:
-            raise ValueError('expected ndim to be 1')
-        if not np.issubdtype(value.dtype, np.integer) and not np.issubdtype(value.dtype, np.floating):
-            raise ValueError('dtype must be numeric')
+        check_ndarray(value)
         value = value.tolist()
 
     return value
 
 
+def to_db_batch(values, dim=None, normalize=False):
+    return validate_batch(values, dim, normalize).tolist()
+
+
 # TODO: Remove this once we support double precision
 class RealField(FloatField):
     description = "Single precision floating point number"
@@ -31,6 +34,41 @@ class RealField(FloatField):
         return super().db_type(connection)
 
 
+class BitVectorField(ArrayField):
+    # stores bit vectors packed 32 bits per integer, which keeps HammingDistance unchanged;
+    # values stay packed as int32 arrays in Python too
+    description = "Bit vector packed into an integer array"
+
+    def __init__(self, dimensions=None, **kwargs):
+        self.dimensions = dimensions
+        kwargs.pop('base_field', None)
+        super().__init__(IntegerField(), **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs.pop('base_field', None)
+        kwargs.pop('size', None)
+        if self.dimensions is not None:
+            kwargs['dimensions'] = self.dimensions
+        return name, path, args, kwargs
+
+    def from_db_value(self, value, expression, connection):
+        return from_db_bits(value, self.dimensions)
+
+    def to_python(self, value):
+        # serialized values are the packed integers
+        if isinstance(value, str):
+            value = np.asarray(super().to_python(value), dtype=np.int32).view(PackedBits)
+        if value is None:
+            return value
+        return to_packed_bits(value, self.dimensions)
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if hasattr(value, 'resolve_expression'):
+            return value
+        return to_db_bits(value, self.dimensions)
+
+
 class LanternExtension(CreateExtension):
     def __init__(self):
         self.name = 'lantern'
@@ -100,6 +138,15 @@ class CosineDistance(DistanceBase):
     arg_joiner = ' <=> '
 
 
+def columnar(queryset, distance, embedding=None, dim=None):
+    # distance is an annotation name or a DistanceBase expression
+    if not isinstance(distance, str):
+        queryset = queryset.annotate(_distance=distance)
+        distance = '_distance'
+    fields = ['pk', distance] + ([embedding] if embedding is not None else [])
+    return VectorResult.from_rows(queryset.values_list(*fields), dim if embedding is not None else None)
+
+
 class TextEmbedding(Func):
     function = 'text_embedding'
 
@@ -0,0 +1,162 @@
+import asyncio
+from contextlib import asynccontextmanager
+from weakref import WeakKeyDictionary
+from django.core.exceptions import EmptyResultSet
+from django.db import DEFAULT_DB_ALIAS, connections, models
+import numpy as np
+from pgvector.instrumentation import clock, observe_query
+from pgvector.routing import LAG_SQL
+from pgvector.utils import VectorResult, from_db_array_binary, from_db_batch
+from .routing import VectorQuerySet, get_selector, is_vector_query, primary_alias
+
+__all__ = ['AsyncVectorPool', 'get_pool', 'acolumnar', 'aembeddings']
+
+# event loop -> alias -> pool
+_pools = WeakKeyDictionary()
+
+
+def _connection_params(using):
+    params = connections[using].get_connection_params()
+    # sync-only and Django-specific options
+    params.pop('cursor_factory', None)
+    params.pop('context', None)
+    return params
+
+
+def _register_loader(conn):
+    from psycopg.adapt import Loader
+    from psycopg.pq import Format
+
+    class Float4ArrayBinaryLoader(Loader):
+        format = Format.BINARY
+
+        def load(self, data):
+            return from_db_array_binary(bytes(data))
+
+    conn.adapters.register_loader('float4[]', Float4ArrayBinaryLoader)
+
+
+class AsyncVectorPool(object):
+    # a connection runs one query at a time, so concurrent requests each take their own;
+    # connections belong to the event loop that opened them, so a new loop starts over
+    def __init__(self, using=DEFAULT_DB_ALIAS, size=10):
+        self.using = using
+        self.size = size
+        self._idle = []
+        self._semaphore = None
+        self._loop = None
+
+    async def _connect(self):
+        from psycopg import AsyncConnection
+
+        conn = await AsyncConnection.connect(autocommit=True, **_connection_params(self.using))
+        _register_loader(conn)
+        return conn
+
+    @asynccontextmanager
+    async def connection(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._idle = []
+            self._semaphore = asyncio.Semaphore(self.size)
+
+        async with self._semaphore:
+            conn = self._idle.pop() if self._idle else await self._connect()
+            try:
+                yield conn
+            finally:
+                if not conn.closed:
+                    self._idle.append(conn)
+
+    async def close(self):
+        while self._idle:
+            await self._idle.pop().close()
+
+
+def get_pool(using=DEFAULT_DB_ALIAS):
+    pools = _pools.setdefault(asyncio.get_running_loop(), {})
+    if using not in pools:
+        pools[using] = AsyncVectorPool(using)
+    return pools[using]
+
+
+async def _replica_lag(alias):
+    async with get_pool(alias).connection() as conn:
+        cur = await conn.execute(LAG_SQL)
+        return (await cur.fetchone())[0]
+
+
+async def _check_replicas(selector):
+    healthy = []
+    for alias in selector.replicas:
+        try:
+            lag = await _replica_lag(alias)
+        except Exception:
+            continue
+        if selector.acceptable(lag):
+            healthy.append(alias)
+    selector.update(healthy)
+
+
+async def _replica(queryset):
+    # VectorQuerySet.db would check replica lag with a blocking query
+    if not isinstance(queryset, VectorQuerySet) or queryset._db is not None or not is_vector_query(queryset.query):
+        return None
+    selector = get_selector()
+    if selector.due():
+        await _check_replicas(selector)
+    return selector.choose(check=False)
+
+
+async def _execute(queryset, pool):
+    from psycopg import AsyncClientCursor
+
+    try:
+        sql, params = queryset.query.get_compiler(using=pool.using).as_sql()
+    except EmptyResultSet:
+        return []
+
+    async with pool.connection() as conn:
+        # params are bound client-side like Django does, so results can still be binary
+        query = AsyncClientCursor(conn).mogrify(sql, params)
+        start = clock()
+        cur = await conn.execute(query, binary=True)
+        rows = await cur.fetchall()
+        if start is not None:
+            observe_query(sql, start)
+        return rows
+
+
+async def _fetch(queryset, pool=None):
+    from psycopg import OperationalError
+
+    if pool is not None:
+        return await _execute(queryset, pool)
+
+    replica = await _replica(queryset)
+    if replica is None:
+        return await _execute(queryset, get_pool(models.QuerySet.db.fget(queryset)))
+
+    try:
+        return await _execute(queryset, get_pool(replica))
+    except OperationalError:
+        # a replica that went down since the last health check
+        get_selector().mark_failed(replica)
+        return await _execute(queryset, get_pool(primary_alias()))
+
+
+async def acolumnar(queryset, distance, embedding=None, dim=None, pool=None):
+    # distance is an annotation name or a DistanceBase expression
+    if not isinstance(distance, str):
+        queryset = queryset.annotate(_distance=distance)
+        distance = '_distance'
+    fields = ['pk', distance] + ([embedding] if embedding is not None else [])
+    rows = await _fetch(queryset.values_list(*fields), pool)
+    return VectorResult.from_rows(rows, dim if embedding is not None else None)
+
+
+async def aembeddings(queryset, embedding, dim=None, pool=None):
+    rows = await _fetch(queryset.values_list('pk', embedding), pool)
+    ids = np.array([row[0] for row in rows])
+    return ids, from_db_batch([row[1] for row in rows], dim)
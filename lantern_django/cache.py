@@ -0,0 +1,65 @@
+from django.core.exceptions import EmptyResultSet
+from django.db import connections
+from django.db.backends.signals import connection_created
+from pgvector.cache import default_cache, invalidate, written_table
+
+__all__ = ['cached']
+
+
+class _Invalidate(object):
+    def __init__(self, table):
+        self.table = table
+
+    def __call__(self):
+        invalidate(self.table)
+
+
+def invalidate_writes(execute, sql, params, many, context):
+    table = written_table(sql)
+    result = execute(sql, params, many, context)
+    if table is not None:
+        invalidate(table)
+        # rows cached by other connections before the commit would be stale again afterwards
+        connection = context['connection']
+        if connection.in_atomic_block:
+            connection.on_commit(_Invalidate(table))
+    return result
+
+
+def _pending_writes(connection):
+    # Django drops on_commit callbacks when their transaction or savepoint rolls back
+    return connection.in_atomic_block and any(isinstance(entry[1], _Invalidate) for entry in connection.run_on_commit)
+
+
+def install_invalidation(connection, **kwargs):
+    if invalidate_writes not in connection.execute_wrappers:
+        connection.execute_wrappers.append(invalidate_writes)
+
+
+connection_created.connect(install_invalidation)
+
+
+def cached(queryset, cache=None):
+    # results are shared between callers, so treat the returned instances as read-only
+    if cache is None:
+        cache = default_cache
+
+    connection = connections[queryset.db]
+    install_invalidation(connection)
+
+    try:
+        sql, params = queryset.query.sql_with_params()
+    except EmptyResultSet:
+        return []
+
+    key = cache.key(queryset._db, sql, params)
+    result = cache.get(key)
+    if result is None:
+        tables = {v.table_name for v in queryset.query.alias_map.values()}
+        tables.add(queryset.model._meta.db_table)
+        versions = cache.versions(tables)
+        result = list(queryset)
+        # uncommitted rows would be served to other connections even if this transaction rolls back
+        if not _pending_writes(connection):
+            cache.set(key, versions, result)
+    return list(result)
@@ -0,0 +1,25 @@
+from django.db import connections
+from django.db.backends.signals import connection_created
+from pgvector.instrumentation import clock, observe_query
+
+__all__ = ['enable_instrumentation']
+
+
+def record_queries(execute, sql, params, many, context):
+    start = clock()
+    result = execute(sql, params, many, context)
+    if start is not None:
+        observe_query(sql, start)
+    return result
+
+
+def install_instrumentation(connection, **kwargs):
+    if record_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_queries)
+
+
+def enable_instrumentation():
+    # nearest neighbor query latency for every connection; codec metrics need no setup
+    connection_created.connect(install_instrumentation)
+    for connection in connections.all(initialized_only=True):
+        install_instrumentation(connection)
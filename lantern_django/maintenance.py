@@ -0,0 +1,29 @@
+from django.apps import apps
+from pgvector.maintenance import OPCLASSES, maintain
+from . import HnswIndex
+
+__all__ = ['hnsw_indexes', 'maintain_index']
+
+
+def hnsw_indexes(models=None):
+    # (model, index) for every HnswIndex declared in Meta.indexes
+    for model in models or apps.get_models():
+        for index in model._meta.indexes:
+            if isinstance(index, HnswIndex):
+                yield model, index
+
+
+def maintain_index(cursor, model, index, **kwargs):
+    opclass = index.opclasses[0] if index.opclasses else 'dist_l2sq_ops'
+    if opclass not in OPCLASSES:
+        raise ValueError('unsupported opclass: %s' % opclass)
+
+    opts = model._meta
+    return maintain(
+        cursor,
+        index.name,
+        opts.get_field(index.fields[0].lstrip('-')).column,
+        opclass,
+        pk=opts.pk.column,
+        **kwargs
+    )
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+from lantern_django.maintenance import hnsw_indexes, maintain_index
+
+
+class Command(BaseCommand):
+    help = 'Checks recall and bloat of HNSW indexes and reindexes the unhealthy ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('--min-recall', type=float, default=0.9)
+        parser.add_argument('--max-dead-ratio', type=float, default=0.2)
+        parser.add_argument('--k', type=int, default=10)
+        parser.add_argument('--samples', type=int, default=20)
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        # VACUUM and REINDEX CONCURRENTLY cannot run inside a transaction block
+        connection.ensure_connection()
+        if not connection.get_autocommit():
+            connection.set_autocommit(True)
+
+        with connection.cursor() as cursor:
+            for model, index in hnsw_indexes():
+                report = maintain_index(
+                    cursor,
+                    model,
+                    index,
+                    min_recall=options['min_recall'],
+                    max_dead_ratio=options['max_dead_ratio'],
+                    k=options['k'],
+                    samples=options['samples'],
+                    dry_run=options['dry_run']
+                )
+                if report['reindexed']:
+                    status = 'vacuumed and reindexed' if report['vacuumed'] else 'reindexed'
+                else:
+                    status = 'unhealthy' if report['reasons'] else 'ok'
+                self.stdout.write('%s: %s recall=%.3f dead_ratio=%.3f size=%d%s' % (
+                    index.name,
+                    status,
+                    report['recall'],
+                    report['dead_ratio'],
+                    report['size'],
+                    ' (%s)' % ', '.join(report['reasons']) if report['reasons'] else ''
+                ))
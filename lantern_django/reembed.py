@@ -0,0 +1,20 @@
+from django.db import DEFAULT_DB_ALIAS, connections
+from pgvector.reembed import ReembedJob
+
+__all__ = ['reembed_job']
+
+
+def reembed_job(model, source, embedding, hash_field, embedding_model, using=DEFAULT_DB_ALIAS, **kwargs):
+    # Django keeps one connection per thread, so workers reuse theirs instead of closing it
+    opts = model._meta
+    return ReembedJob(
+        lambda: connections[using],
+        opts.db_table,
+        opts.get_field(source).column,
+        opts.get_field(embedding).column,
+        opts.get_field(hash_field).column,
+        embedding_model,
+        pk=opts.pk.column,
+        release=lambda conn: None,
+        **kwargs
+    )
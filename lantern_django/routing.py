@@ -0,0 +1,139 @@
+from functools import partial
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, models
+from pgvector.routing import LAG_SQL, ReplicaSelector
+from . import DistanceBase
+
+__all__ = ['VectorQuerySet', 'VectorManager', 'PrimaryRouter', 'get_selector']
+
+_selector = None
+
+
+def primary_alias():
+    return getattr(settings, 'LANTERN_PRIMARY', DEFAULT_DB_ALIAS)
+
+
+def replica_lag(alias):
+    with connections[alias].cursor() as cursor:
+        cursor.execute(LAG_SQL)
+        return cursor.fetchone()[0]
+
+
+def get_selector():
+    global _selector
+    if _selector is None:
+        _selector = ReplicaSelector(
+            getattr(settings, 'LANTERN_READ_REPLICAS', []),
+            lag=replica_lag,
+            max_lag=getattr(settings, 'LANTERN_REPLICA_MAX_LAG', None),
+            check_interval=getattr(settings, 'LANTERN_REPLICA_CHECK_INTERVAL', 5)
+        )
+    return _selector
+
+
+def has_distance(expression):
+    if isinstance(expression, DistanceBase):
+        return True
+    get_source_expressions = getattr(expression, 'get_source_expressions', None)
+    if get_source_expressions is None:
+        return False
+    return any(has_distance(e) for e in get_source_expressions() if e is not None)
+
+
+def is_vector_query(query):
+    return (
+        any(has_distance(e) for e in query.annotations.values())
+        or any(has_distance(e) for e in query.order_by)
+        or has_distance(query.where)
+    )
+
+
+class VectorQuerySet(models.QuerySet):
+    @property
+    def db(self):
+        # explicit using() calls and writes keep their database
+        if self._db is None and not self._for_write and is_vector_query(self.query):
+            replica = get_selector().choose()
+            if replica is not None:
+                return replica
+        return super().db
+
+    def _replica(self):
+        if self._db is not None or self._for_write or not is_vector_query(self.query):
+            return None
+        return get_selector().choose()
+
+    def _routed(self, run):
+        # a replica that went down since the last health check is skipped and the query rerun on the primary
+        replica = self._replica()
+        if replica is None:
+            return run()
+
+        self._db = replica
+        try:
+            try:
+                return run()
+            except OperationalError:
+                get_selector().mark_failed(replica)
+                self._db = primary_alias()
+                return run()
+        finally:
+            self._db = None
+
+    def _fetch_all(self):
+        if self._result_cache is not None:
+            return super()._fetch_all()
+        self._routed(super()._fetch_all)
+
+    def count(self):
+        return self._routed(super().count)
+
+    def exists(self):
+        return self._routed(super().exists)
+
+    def aggregate(self, *args, **kwargs):
+        return self._routed(partial(super().aggregate, *args, **kwargs))
+
+    def iterator(self, *args, **kwargs):
+        replica = self._replica()
+        if replica is None:
+            return super().iterator(*args, **kwargs)
+
+        clone = self._chain()
+        clone._db = replica
+        return _fallback_iterator(clone, replica, clone.iterator(*args, **kwargs), args, kwargs)
+
+
+def _fallback_iterator(queryset, replica, rows, args, kwargs):
+    # only a failure before the first row can be retried
+    try:
+        first = next(rows)
+    except StopIteration:
+        return
+    except OperationalError:
+        get_selector().mark_failed(replica)
+        queryset._db = primary_alias()
+        rows = queryset.iterator(*args, **kwargs)
+        try:
+            first = next(rows)
+        except StopIteration:
+            return
+    yield first
+    yield from rows
+
+
+VectorManager = models.Manager.from_queryset(VectorQuerySet)
+
+
+class PrimaryRouter(object):
+    def db_for_read(self, model, **hints):
+        return primary_alias()
+
+    def db_for_write(self, model, **hints):
+        return primary_alias()
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == primary_alias()
@@ -24,6 +24,8 @@ setup(
     python_requires='>=3.6',
     install_requires=[
         'numpy',
-        'Django'
+        'Django',
+        # the helpers in pgvector.* are published from ../setup.py as lantern-python; keep the versions in step
+        'lantern-python==0.0.0'
     ]
 )
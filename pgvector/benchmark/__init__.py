@@ -0,0 +1,126 @@
+import itertools
+from time import perf_counter
+import numpy as np
+from ..utils import validate_batch
+
+__all__ = ['Benchmark', 'exact_neighbors', 'recall', 'parameter_grid', 'format_report']
+
+METRICS = {
+    'l2': ('<->', 'dist_l2sq_ops'),
+    'cosine': ('<=>', 'dist_cos_ops')
+}
+
+
+def exact_neighbors(base, queries, k, metric='l2', chunk_size=1024):
+    # brute force in chunks of queries so the distance matrix stays bounded
+    base = np.asarray(base, dtype=np.float32)
+    queries = np.asarray(queries, dtype=np.float32)
+    k = min(k, len(base))
+
+    if metric == 'cosine':
+        base = base / np.linalg.norm(base, axis=1, keepdims=True)
+        queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    elif metric != 'l2':
+        raise ValueError('unsupported metric: %s' % metric)
+
+    base_norms = (base ** 2).sum(axis=1)
+    neighbors = np.empty((len(queries), k), dtype=np.int64)
+    for start in range(0, len(queries), chunk_size):
+        chunk = queries[start:start + chunk_size]
+        if metric == 'l2':
+            distances = base_norms - 2 * chunk @ base.T
+        else:
+            distances = -(chunk @ base.T)
+        top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        order = np.argsort(np.take_along_axis(distances, top, axis=1), axis=1)
+        neighbors[start:start + chunk_size] = np.take_along_axis(top, order, axis=1)
+    return neighbors
+
+
+def recall(found, truth):
+    hits = [len(set(f).intersection(t)) for f, t in zip(found, truth)]
+    return sum(hits) / float(np.asarray(truth).size)
+
+
+def parameter_grid(**params):
+    names = list(params)
+    return [dict(zip(names, values)) for values in itertools.product(*[params[n] for n in names])]
+
+
+class Benchmark(object):
+    # ids are the row positions in base, which keeps ground truth lookups trivial
+    def __init__(self, conn, base, queries, table='benchmark_items', metric='l2'):
+        self.conn = conn
+        self.base = validate_batch(base)
+        self.queries = validate_batch(queries, dim=self.base.shape[1])
+        self.table = table
+        self.metric = metric
+        self.operator, self.opclass = METRICS[metric]
+
+    @property
+    def dim(self):
+        return self.base.shape[1]
+
+    def load(self, batch_size=1000):
+        from psycopg2.extras import execute_values
+
+        cur = self.conn.cursor()
+        cur.execute('DROP TABLE IF EXISTS %s' % self.table)
+        cur.execute('CREATE TABLE %s (id bigint PRIMARY KEY, embedding real[])' % self.table)
+        for start in range(0, len(self.base), batch_size):
+            rows = self.base[start:start + batch_size].tolist()
+            execute_values(cur, 'INSERT INTO %s (id, embedding) VALUES %%s' % self.table,
+                           [(start + i, v) for i, v in enumerate(rows)], page_size=batch_size)
+        self.conn.commit()
+
+    def run(self, grid, k=10):
+        truth = exact_neighbors(self.base, self.queries, k, self.metric)
+        return [self.evaluate(params, truth, k) for params in grid]
+
+    def evaluate(self, params, truth, k):
+        cur = self.conn.cursor()
+        index = '%s_hnsw_idx' % self.table
+        with_params = ', '.join(['%s = %d' % (name, value) for name, value in sorted(params.items())] + ['dim = %d' % self.dim])
+
+        cur.execute('DROP INDEX IF EXISTS %s' % index)
+        started = perf_counter()
+        cur.execute('CREATE INDEX %s ON %s USING hnsw (embedding %s) WITH (%s)' % (index, self.table, self.opclass, with_params))
+        self.conn.commit()
+        build_time = perf_counter() - started
+
+        cur.execute('SELECT pg_relation_size(%s)', (index,))
+        index_size = cur.fetchone()[0]
+
+        cur.execute('SET enable_seqscan = off')
+        sql = 'SELECT id FROM %s ORDER BY embedding %s %%s::real[] LIMIT %d' % (self.table, self.operator, k)
+        latencies = np.empty(len(self.queries))
+        found = []
+        for i, query in enumerate(self.queries.tolist()):
+            started = perf_counter()
+            cur.execute(sql, (query,))
+            rows = cur.fetchall()
+            latencies[i] = perf_counter() - started
+            found.append([v[0] for v in rows])
+        cur.execute('RESET enable_seqscan')
+        self.conn.commit()
+
+        return dict(
+            params,
+            recall=recall(found, truth),
+            p50=float(np.percentile(latencies, 50)),
+            p99=float(np.percentile(latencies, 99)),
+            qps=len(latencies) / float(latencies.sum()),
+            build_time=build_time,
+            index_size=index_size
+        )
+
+
+def format_report(results):
+    if not results:
+        return ''
+    columns = list(results[0])
+    rows = [['%.4f' % v if isinstance(v, float) else str(v) for v in r.values()] for r in results]
+    widths = [max(len(c), *[len(r[i]) for r in rows]) for i, c in enumerate(columns)]
+    lines = ['  '.join(c.rjust(w) for c, w in zip(columns, widths))]
+    lines.extend('  '.join(v.rjust(w) for v, w in zip(r, widths)) for r in rows)
+    return '\n'.join(lines)
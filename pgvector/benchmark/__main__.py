@@ -0,0 +1,27 @@
+import argparse
+import numpy as np
+import psycopg2
+from . import Benchmark, format_report, parameter_grid
+
+
+def int_list(value):
+    return [int(v) for v in value.split(',')]
+
+
+parser = argparse.ArgumentParser(prog='python -m pgvector.benchmark', description='Measure recall and latency of HNSW index parameters')
+parser.add_argument('base', help='.npy file with the vectors to index')
+parser.add_argument('queries', help='.npy file with the query vectors')
+parser.add_argument('--dsn', default='dbname=postgres')
+parser.add_argument('--table', default='benchmark_items')
+parser.add_argument('--metric', default='l2', choices=['l2', 'cosine'])
+parser.add_argument('-k', type=int, default=10)
+parser.add_argument('--m', type=int_list, default=[16])
+parser.add_argument('--ef-construction', type=int_list, default=[64])
+parser.add_argument('--ef', type=int_list, default=[64])
+args = parser.parse_args()
+
+conn = psycopg2.connect(args.dsn)
+benchmark = Benchmark(conn, np.load(args.base, mmap_mode='r'), np.load(args.queries, mmap_mode='r'), table=args.table, metric=args.metric)
+benchmark.load()
+results = benchmark.run(parameter_grid(m=args.m, ef_construction=args.ef_construction, ef=args.ef), k=args.k)
+print(format_report(results))
@@ -0,0 +1,203 @@
+import mmap
+from collections import deque
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+from struct import pack
+import numpy as np
+from ..utils import check_ndarray
+
+__all__ = ['copy_vectors', 'to_copy_binary']
+
+COPY_HEADER = b'PGCOPY\n\xff\r\n\x00' + pack('>ii', 0, 0)
+COPY_TRAILER = pack('>h', -1)
+FLOAT4_OID = 700
+
+
+def _row_dtype(dim, format, with_ids):
+    fields = [('nfields', '>i2')]
+    if with_ids:
+        fields += [('id_len', '>i4'), ('id', '>i8')]
+    if format == 'vector':
+        fields += [('len', '>i4'), ('dim', '>u2'), ('unused', '>u2'), ('values', '>f4', (dim,))]
+    elif format == 'real[]':
+        # every array element carries its own length
+        fields += [('len', '>i4'), ('ndim', '>i4'), ('hasnull', '>i4'), ('elemtype', '>i4'),
+                   ('dim', '>i4'), ('lbound', '>i4'), ('values', [('len', '>i4'), ('value', '>f4')], (dim,))]
+    else:
+        raise ValueError('format must be vector or real[]')
+    return np.dtype(fields)
+
+
+def to_copy_binary(vectors, ids=None, format='vector', out=None):
+    # encodes rows for COPY ... (FORMAT BINARY), without the header and trailer
+    vectors = np.asarray(vectors)
+    check_ndarray(vectors, ndim=2)
+    n, dim = vectors.shape
+    dtype = _row_dtype(dim, format, ids is not None)
+
+    if out is None:
+        rows = np.empty(n, dtype=dtype)
+    else:
+        rows = np.ndarray(n, dtype=dtype, buffer=out)
+
+    rows['nfields'] = 1 if ids is None else 2
+    if ids is not None:
+        rows['id_len'] = 8
+        rows['id'] = ids
+    rows['dim'] = dim
+    if format == 'vector':
+        rows['len'] = 4 + 4 * dim
+        rows['unused'] = 0
+        rows['values'] = vectors
+    else:
+        rows['len'] = 20 + 8 * dim
+        rows['ndim'] = 1
+        rows['hasnull'] = 0
+        rows['elemtype'] = FLOAT4_OID
+        rows['lbound'] = 1
+        rows['values']['len'] = 4
+        rows['values']['value'] = vectors
+
+    if out is None:
+        return rows.tobytes()
+    return dtype.itemsize * n
+
+
+def _source(vectors, start, stop):
+    # memory-mapped files are reopened by the workers instead of pickling rows
+    if isinstance(vectors, np.memmap) and isinstance(vectors.base, mmap.mmap) and vectors.flags.c_contiguous:
+        return ('memmap', vectors.filename, vectors.dtype.str, vectors.shape, vectors.offset, start, stop)
+    return ('array', vectors[start:stop])
+
+
+def _encode_shared(source, ids, format):
+    if source[0] == 'memmap':
+        filename, dtype, shape, offset, start, stop = source[1:]
+        vectors = np.memmap(filename, dtype=dtype, mode='r', shape=shape, offset=offset)[start:stop]
+    else:
+        vectors = source[1]
+
+    dim = vectors.shape[1]
+    size = _row_dtype(dim, format, ids is not None).itemsize * len(vectors)
+    shm = SharedMemory(create=True, size=max(size, 1))
+    try:
+        to_copy_binary(vectors, ids, format, out=shm.buf[:size])
+    except BaseException:
+        shm.close()
+        shm.unlink()
+        raise
+    shm.close()
+    return shm.name, size
+
+
+def _unlink(name):
+    shm = SharedMemory(name=name)
+    shm.close()
+    shm.unlink()
+
+
+def _chunks(vectors, ids, format, processes, chunk_size):
+    n = len(vectors)
+    bounds = [(start, min(start + chunk_size, n)) for start in range(0, n, chunk_size)]
+
+    if processes is None or processes <= 1:
+        for start, stop in bounds:
+            yield to_copy_binary(vectors[start:stop], None if ids is None else ids[start:stop], format)
+        return
+
+    # keep a bounded window in flight and yield in submission order
+    with get_context('spawn').Pool(processes) as pool:
+        pending = deque()
+        bounds = iter(bounds)
+        try:
+            while True:
+                while len(pending) < 2 * processes:
+                    bound = next(bounds, None)
+                    if bound is None:
+                        break
+                    start, stop = bound
+                    chunk_ids = None if ids is None else ids[start:stop]
+                    pending.append(pool.apply_async(_encode_shared, (_source(vectors, start, stop), chunk_ids, format)))
+
+                if not pending:
+                    break
+
+                name, size = pending.popleft().get()
+                shm = SharedMemory(name=name)
+                view = shm.buf[:size]
+                try:
+                    yield view
+                finally:
+                    view.release()
+                    shm.close()
+                    shm.unlink()
+        finally:
+            # when COPY fails or the consumer stops early, wait for the chunks in flight
+            # so their segments do not outlive the pool in /dev/shm
+            for result in pending:
+                try:
+                    name, size = result.get()
+                except Exception:
+                    continue
+                _unlink(name)
+
+
+class _Reader(object):
+    # file-like view over the chunks for psycopg2 copy_expert
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self._current = memoryview(b'')
+        self._pos = 0
+
+    def read(self, size=-1):
+        parts = []
+        n = 0
+        while size < 0 or n < size:
+            if self._pos >= len(self._current):
+                chunk = next(self._chunks, None)
+                if chunk is None:
+                    break
+                # shared memory is released once the generator moves on
+                self._current = memoryview(bytes(chunk))
+                self._pos = 0
+            take = len(self._current) - self._pos
+            if size >= 0:
+                take = min(take, size - n)
+            parts.append(self._current[self._pos:self._pos + take])
+            self._pos += take
+            n += take
+        return b''.join(parts)
+
+    readline = read
+
+
+def copy_vectors(cur, table, vectors, column='embedding', ids=None, id_column='id', format='vector', processes=None, chunk_size=10000):
+    if ids is not None:
+        ids = np.asarray(ids, dtype=np.int64)
+        if len(ids) != len(vectors):
+            raise ValueError('expected %d ids, not %d' % (len(vectors), len(ids)))
+        columns = '%s, %s' % (id_column, column)
+    else:
+        columns = column
+
+    sql = 'COPY %s (%s) FROM STDIN (FORMAT BINARY)' % (table, columns)
+    chunks = _chunks(vectors, ids, format, processes, chunk_size)
+
+    try:
+        if hasattr(cur, 'copy'):
+            # psycopg 3
+            with cur.copy(sql) as copy:
+                copy.write(COPY_HEADER)
+                for chunk in chunks:
+                    copy.write(chunk)
+                copy.write(COPY_TRAILER)
+        else:
+            def stream():
+                yield COPY_HEADER
+                yield from chunks
+                yield COPY_TRAILER
+
+            cur.copy_expert(sql, _Reader(stream()), size=1024 * 1024)
+    finally:
+        # releases shared memory right away if COPY failed
+        chunks.close()
@@ -0,0 +1,117 @@
+import hashlib
+import re
+import sys
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+import numpy as np
+
+__all__ = ['ResultCache', 'default_cache', 'invalidate', 'written_table']
+
+_versions = {}
+_versions_lock = Lock()
+
+WRITE_RE = re.compile(r'^\s*(?:INSERT\s+INTO|UPDATE|DELETE\s+FROM|TRUNCATE(?:\s+TABLE)?)\s+(?:ONLY\s+)?([\w."]+)', re.IGNORECASE)
+
+
+def invalidate(table):
+    # every cache entry remembers the versions of its tables, so bumping one drops them lazily
+    with _versions_lock:
+        _versions[table] = _versions.get(table, 0) + 1
+
+
+def written_table(sql):
+    match = WRITE_RE.match(sql)
+    if match is None:
+        return None
+    return match.group(1).replace('"', '').split('.')[-1]
+
+
+def _feed(h, value):
+    if isinstance(value, np.ndarray):
+        h.update(b'a%s%s' % (value.dtype.str.encode(), str(value.shape).encode()))
+        h.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, (list, tuple)):
+        h.update(b'[%d' % len(value))
+        for v in value:
+            _feed(h, v)
+    elif isinstance(value, dict):
+        h.update(b'{%d' % len(value))
+        for k in sorted(value):
+            _feed(h, k)
+            _feed(h, value[k])
+    else:
+        h.update(b'%s:%s;' % (type(value).__name__.encode(), repr(value).encode()))
+
+
+def _sizeof(value):
+    if isinstance(value, np.ndarray):
+        return sys.getsizeof(value) + (0 if value.base is None else value.nbytes)
+    size = sys.getsizeof(value)
+    if isinstance(value, (list, tuple)):
+        size += sum(_sizeof(v) for v in value)
+    elif isinstance(value, dict):
+        size += sum(_sizeof(v) for v in value.values())
+    elif hasattr(value, '__dict__'):
+        size += _sizeof(vars(value))
+    return size
+
+
+class ResultCache(object):
+    def __init__(self, max_bytes=64 * 1024 * 1024, ttl=60):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.nbytes = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def key(self, *parts):
+        h = hashlib.blake2b(digest_size=16)
+        _feed(h, parts)
+        return h.digest()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+
+            expires, versions, size, value = entry
+            if monotonic() > expires or any(_versions.get(t, 0) != v for t, v in versions):
+                self._remove(key)
+                return default
+
+            self._entries.move_to_end(key)
+            return value
+
+    def versions(self, tables):
+        # take this before running the query, so a write that lands while it runs is not missed
+        with _versions_lock:
+            return tuple((t, _versions.get(t, 0)) for t in tables)
+
+    def set(self, key, versions, value):
+        size = _sizeof(value)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (monotonic() + self.ttl, versions, size, value)
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, key):
+        self.nbytes -= self._entries.pop(key)[2]
+
+
+default_cache = ResultCache()
@@ -0,0 +1,97 @@
+import numpy as np
+from ..utils import from_db_batch
+
+__all__ = ['CentroidAccumulator', 'grouped_centroids', 'iter_chunks', 'assign', 'kmeans']
+
+
+class CentroidAccumulator(object):
+    # running float64 sums per group, so chunks never need to be held together
+    def __init__(self, dim):
+        self.dim = dim
+        self.labels = []
+        self._index = {}
+        self._sums = np.zeros((0, dim), dtype=np.float64)
+        self._counts = np.zeros(0, dtype=np.int64)
+
+    def add(self, labels, vectors):
+        vectors = from_db_batch(vectors, self.dim) if not isinstance(vectors, np.ndarray) else vectors
+        unique, inverse = np.unique(np.asarray(labels), return_inverse=True)
+
+        positions = np.empty(len(unique), dtype=np.int64)
+        for i, label in enumerate(unique.tolist()):
+            position = self._index.get(label)
+            if position is None:
+                position = self._index[label] = len(self.labels)
+                self.labels.append(label)
+            positions[i] = position
+
+        if len(self.labels) > len(self._counts):
+            grow = len(self.labels) - len(self._counts)
+            self._sums = np.vstack([self._sums, np.zeros((grow, self.dim))])
+            self._counts = np.concatenate([self._counts, np.zeros(grow, dtype=np.int64)])
+
+        rows = positions[inverse.reshape(-1)]
+        np.add.at(self._sums, rows, vectors)
+        self._counts += np.bincount(rows, minlength=len(self._counts))
+
+    def centroids(self):
+        return self.labels, (self._sums / np.maximum(self._counts, 1)[:, np.newaxis]).astype(np.float32)
+
+
+def iter_chunks(cursor, dim=None, chunk_size=10000):
+    # yields (first column, decoded second column) per fetchmany chunk; rows with a NULL vector are skipped, like AVG does
+    # a named (server-side) cursor streams the rows; an ordinary one already holds the whole result
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        rows = [v for v in rows if v[1] is not None]
+        yield [v[0] for v in rows], from_db_batch([v[1] for v in rows], dim)
+
+
+def grouped_centroids(cursor, dim, chunk_size=10000):
+    accumulator = CentroidAccumulator(dim)
+    for labels, vectors in iter_chunks(cursor, dim, chunk_size):
+        accumulator.add(labels, vectors)
+    return accumulator.centroids()
+
+
+def _distances(vectors, centroids, metric):
+    if metric == 'l2':
+        return (centroids ** 2).sum(axis=1) - 2 * vectors @ centroids.T
+    if metric == 'cosine':
+        norms = np.linalg.norm(centroids, axis=1)
+        return -(vectors @ centroids.T) / np.where(norms == 0, 1, norms)
+    raise ValueError('unsupported metric: %s' % metric)
+
+
+def assign(vectors, centroids, metric='l2', chunk_size=10000):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    centroids = np.asarray(centroids, dtype=np.float32)
+    labels = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), chunk_size):
+        labels[start:start + chunk_size] = _distances(vectors[start:start + chunk_size], centroids, metric).argmin(axis=1)
+    return labels
+
+
+def kmeans(chunks, k, iterations=10, metric='l2', seed=None):
+    # chunks is a callable returning a fresh iterable of 2-D chunks, e.g. reading a snapshot or a cursor
+    rng = np.random.default_rng(seed)
+
+    first = np.asarray(next(iter(chunks())), dtype=np.float32)
+    if len(first) < k:
+        raise ValueError('expected at least %d vectors in the first chunk, not %d' % (k, len(first)))
+    centroids = first[rng.choice(len(first), k, replace=False)]
+
+    for _ in range(iterations):
+        accumulator = CentroidAccumulator(first.shape[1])
+        for chunk in chunks():
+            chunk = np.asarray(chunk, dtype=np.float32)
+            accumulator.add(assign(chunk, centroids, metric), chunk)
+
+        labels, updated = accumulator.centroids()
+        # clusters that lost all their members keep their previous centroid
+        centroids = centroids.copy()
+        centroids[labels] = updated
+
+    return centroids
@@ -0,0 +1,110 @@
+from functools import lru_cache
+import re
+from time import perf_counter
+
+__all__ = ['CallbackRecorder', 'OpenTelemetryRecorder', 'set_recorder', 'get_recorder', 'clock', 'observe_codec', 'observe_query', 'query_labels']
+
+METRICS = {
+    '<->': 'l2',
+    '<#>': 'max_inner_product',
+    '<=>': 'cosine',
+    '<+>': 'hamming'
+}
+
+QUERY_RE = re.compile(r'\bORDER\s+BY\b.*?(<->|<#>|<=>|<\+>)(?:.*?\bLIMIT\s+(\d+))?', re.IGNORECASE | re.DOTALL)
+
+# hooks only check this for None, so nothing else runs while instrumentation is off
+recorder = None
+
+
+class CallbackRecorder(object):
+    # callback(kind, name, value, attributes) with kind 'counter' or 'histogram'
+    def __init__(self, callback):
+        self.callback = callback
+
+    def increment(self, name, value, attributes):
+        self.callback('counter', name, value, attributes)
+
+    def record(self, name, value, attributes):
+        self.callback('histogram', name, value, attributes)
+
+
+class OpenTelemetryRecorder(object):
+    # meter is an opentelemetry.metrics.Meter, or anything with the same create_* methods
+    def __init__(self, meter):
+        self.meter = meter
+        self._counters = {}
+        self._histograms = {}
+
+    def increment(self, name, value, attributes):
+        counter = self._counters.get(name)
+        if counter is None:
+            counter = self._counters[name] = self.meter.create_counter(name)
+        counter.add(value, attributes)
+
+    def record(self, name, value, attributes):
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            histogram = self._histograms[name] = self.meter.create_histogram(name, unit='s')
+        histogram.record(value, attributes)
+
+
+def set_recorder(value):
+    global recorder
+    recorder = value
+
+
+def get_recorder():
+    return recorder
+
+
+def clock():
+    # start time for a hook, or None when disabled
+    if recorder is None:
+        return None
+    return perf_counter()
+
+
+def observe_codec(operation, format, vectors, size, start):
+    # operation is 'encoded' or 'decoded', format is 'text' or 'binary'
+    rec = recorder
+    if rec is None:
+        return
+
+    elapsed = perf_counter() - start
+    attributes = {'format': format}
+    rec.increment('pgvector.vectors.%s' % operation, vectors, attributes)
+    rec.increment('pgvector.bytes.%s' % operation, size, attributes)
+    rec.record('pgvector.codec.duration', elapsed, {'operation': operation, 'format': format})
+
+
+@lru_cache(maxsize=1024)
+def query_labels(sql):
+    # (metric, k) for nearest neighbor queries, otherwise None; k is None when it is a parameter
+    if isinstance(sql, bytes):
+        sql = sql.decode('utf-8', 'replace')
+    match = QUERY_RE.search(sql)
+    if match is None:
+        return None
+    return METRICS[match.group(1)], int(match.group(2)) if match.group(2) else None
+
+
+def observe_query(sql, start, labels=None):
+    rec = recorder
+    if rec is None:
+        return
+
+    elapsed = perf_counter() - start
+    if labels is None:
+        if not isinstance(sql, (str, bytes)):
+            sql = str(sql)
+        labels = query_labels(sql)
+        if labels is None:
+            return
+
+    metric, k = labels
+    attributes = {'metric': metric}
+    if k is not None:
+        attributes['k'] = k
+    rec.increment('pgvector.queries', 1, attributes)
+    rec.record('pgvector.query.duration', elapsed, attributes)
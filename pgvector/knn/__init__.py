@@ -0,0 +1,185 @@
+from functools import lru_cache
+import numpy as np
+from weakref import WeakSet
+from ..instrumentation import clock, observe_query
+from ..utils import to_db_array_binary, to_db_binary
+
+__all__ = ['KnnQuery', 'knn_query']
+
+OPERATORS = {
+    'l2': '<->',
+    'max_inner_product': '<#>',
+    'cosine': '<=>',
+    'hamming': '<+>'
+}
+
+# adapter maps of connections the dumpers were added to
+_registered = WeakSet()
+_dumpers = None
+
+
+class _Float4Array(object):
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+
+class _BinaryVector(object):
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+
+def _register_psycopg(conn):
+    # connections copy the global adapters when they are opened, so register on each one
+    global _dumpers
+    if conn.adapters in _registered:
+        return
+
+    if _dumpers is None:
+        _dumpers = _psycopg_dumpers()
+    for cls, dumper in _dumpers:
+        conn.adapters.register_dumper(cls, dumper)
+    _registered.add(conn.adapters)
+
+
+def _psycopg_dumpers():
+    from psycopg.adapt import Dumper
+    from psycopg.pq import Format
+
+    class Float4ArrayBinaryDumper(Dumper):
+        format = Format.BINARY
+        oid = 1021
+
+        def dump(self, obj):
+            return to_db_array_binary(obj.value)
+
+    class VectorBinaryDumper(Dumper):
+        # the type is taken from the cast in the query
+        format = Format.BINARY
+
+        def dump(self, obj):
+            return to_db_binary(obj.value)
+
+    return [(_Float4Array, Float4ArrayBinaryDumper), (_BinaryVector, VectorBinaryDumper)]
+
+
+class KnnQuery(object):
+    # the SQL text is fixed per shape, so drivers can keep reusing one prepared statement
+    def __init__(self, table, column='embedding', metric='l2', k=10, columns=('id',), filters=(), type='real[]'):
+        if metric not in OPERATORS:
+            raise ValueError('unsupported metric: %s' % metric)
+        self.table = table
+        self.column = column
+        self.metric = metric
+        self.k = k
+        self.columns = tuple(columns)
+        self.filters = tuple(filters)
+        self.type = type
+
+        self.psycopg_sql = self._sql('%(vector)b', ['%%(filter_%d)s' % i for i in range(len(self.filters))])
+        self.asyncpg_sql = self._sql('$1', ['$%d' % (i + 2) for i in range(len(self.filters))])
+        self.sqlalchemy_sql = self._sql(':vector', [':filter_%d' % i for i in range(len(self.filters))])
+        self._statement = None
+
+    def _sql(self, vector, placeholders):
+        distance = '%s %s CAST(%s AS %s)' % (self.column, OPERATORS[self.metric], vector, self.type)
+        sql = 'SELECT %s, %s AS distance FROM %s' % (', '.join(self.columns), distance, self.table)
+        if self.filters:
+            sql += ' WHERE ' + ' AND '.join('%s = %s' % (f, p) for f, p in zip(self.filters, placeholders))
+        return sql + ' ORDER BY %s LIMIT %d' % (distance, self.k)
+
+    def _check(self, filters):
+        if len(filters) != len(self.filters):
+            raise ValueError('expected %d filter values, not %d' % (len(self.filters), len(filters)))
+
+    def _params(self, vector, filters):
+        self._check(filters)
+        params = {'filter_%d' % i: v for i, v in enumerate(filters)}
+        params['vector'] = vector
+        return params
+
+    def _psycopg_params(self, conn, vector, filters):
+        _register_psycopg(conn)
+        vector = np.asarray(vector, dtype=np.float32)
+        return self._params(_BinaryVector(vector) if self.type == 'vector' else _Float4Array(vector), filters)
+
+    def _observe(self, start):
+        if start is not None:
+            observe_query(None, start, (self.metric, self.k))
+
+    def fetch(self, conn, vector, *filters):
+        # psycopg 3
+        start = clock()
+        rows = conn.execute(self.psycopg_sql, self._psycopg_params(conn, vector, filters), prepare=True).fetchall()
+        self._observe(start)
+        return rows
+
+    async def afetch(self, conn, vector, *filters):
+        # psycopg 3 async
+        start = clock()
+        cur = await conn.execute(self.psycopg_sql, self._psycopg_params(conn, vector, filters), prepare=True)
+        rows = await cur.fetchall()
+        self._observe(start)
+        return rows
+
+    def planning_time(self, conn, vector, *filters, executions=2):
+        # psycopg 3; Planning Time in ms of the plain query, and of EXECUTE reusing a generic plan.
+        # With plan_cache_mode = auto the switch to a generic plan is a cost estimate, so it is forced;
+        # the first execution builds the plan and the last one is measured
+        from psycopg import ClientCursor
+
+        explain = 'EXPLAIN (ANALYZE, FORMAT JSON) '
+        plain = conn.execute(explain + self.psycopg_sql, self._psycopg_params(conn, vector, filters)).fetchone()[0]
+
+        name = 'knn_planning_%d' % id(self)
+        vector = np.asarray(vector, dtype=np.float32).tolist()
+        cur = ClientCursor(conn)
+        cur.execute('PREPARE %s AS %s' % (name, self.asyncpg_sql))
+        cur.execute('SET plan_cache_mode = force_generic_plan')
+        try:
+            args = ', '.join(['%s'] * (len(filters) + 1))
+            for _ in range(executions):
+                cur.execute(explain + 'EXECUTE %s(%s)' % (name, args), [vector] + list(filters))
+                prepared = cur.fetchone()[0]
+        finally:
+            cur.execute('RESET plan_cache_mode')
+            cur.execute('DEALLOCATE %s' % name)
+            cur.close()
+        return plain[0]['Planning Time'], prepared[0]['Planning Time']
+
+    async def fetch_asyncpg(self, conn, vector, *filters):
+        # asyncpg keeps prepared statements in a per-connection cache keyed by the SQL text
+        self._check(filters)
+        if isinstance(vector, np.ndarray):
+            vector = vector.tolist()
+        start = clock()
+        rows = await conn.fetch(self.asyncpg_sql, vector, *filters)
+        self._observe(start)
+        return rows
+
+    def statement(self):
+        if self._statement is None:
+            from sqlalchemy import bindparam, text
+            from sqlalchemy.dialects.postgresql import ARRAY, REAL
+            from ..sqlalchemy import Vector
+
+            type_ = Vector() if self.type == 'vector' else ARRAY(REAL)
+            self._statement = text(self.sqlalchemy_sql).bindparams(bindparam('vector', type_=type_))
+        return self._statement
+
+    def execute(self, conn, vector, *filters):
+        # SQLAlchemy; the text construct is built once, so its compiled form is cached too
+        if isinstance(vector, np.ndarray) and self.type != 'vector':
+            vector = vector.tolist()
+        start = clock()
+        rows = conn.execute(self.statement(), self._params(vector, filters)).all()
+        self._observe(start)
+        return rows
+
+
+@lru_cache(maxsize=256)
+def knn_query(table, column='embedding', metric='l2', k=10, columns=('id',), filters=(), type='real[]'):
+    return KnnQuery(table, column, metric, k, columns, filters, type)
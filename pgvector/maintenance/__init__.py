@@ -0,0 +1,96 @@
+__all__ = ['OPCLASSES', 'index_stats', 'sampled_recall', 'reindex', 'vacuum', 'maintain']
+
+# operator used by the index and an exact distance that cannot use it
+OPCLASSES = {
+    'dist_l2sq_ops': ('<->', 'l2sq_dist(%s, %s)'),
+    'dist_cos_ops': ('<=>', 'cos_dist(%s, %s)'),
+    'dist_hamming_ops': ('<+>', 'hamming_dist(%s, %s)'),
+    'vector_l2_ops': ('<->', 'l2_distance(%s, %s)'),
+    'vector_ip_ops': ('<#>', '(-inner_product(%s, %s))'),
+    'vector_cosine_ops': ('<=>', 'cosine_distance(%s, %s)')
+}
+
+
+def index_stats(cur, index):
+    cur.execute(
+        'SELECT t.relname, pg_relation_size(i.oid), s.n_live_tup, s.n_dead_tup '
+        'FROM pg_index x '
+        'JOIN pg_class i ON i.oid = x.indexrelid '
+        'JOIN pg_class t ON t.oid = x.indrelid '
+        'LEFT JOIN pg_stat_user_tables s ON s.relid = t.oid '
+        'WHERE i.relname = %s',
+        (index,)
+    )
+    row = cur.fetchone()
+    if row is None:
+        raise ValueError('index not found: %s' % index)
+
+    table, size, live, dead = row
+    live = live or 0
+    dead = dead or 0
+    return {
+        'index': index,
+        'table': table,
+        'size': size,
+        'live_tuples': live,
+        'dead_tuples': dead,
+        'dead_ratio': dead / float(live + dead) if live + dead > 0 else 0.0,
+        'bytes_per_tuple': size / float(live) if live > 0 else None
+    }
+
+
+def sampled_recall(cur, table, column, opclass, pk='id', k=10, samples=20):
+    # random rows are the queries; approximate and exact neighbors are compared server-side
+    operator, exact = OPCLASSES[opclass]
+    cur.execute('SET enable_seqscan = off')
+    try:
+        cur.execute(
+            'WITH q AS (SELECT %s AS v FROM %s WHERE %s IS NOT NULL ORDER BY random() LIMIT %d) '
+            'SELECT ARRAY(SELECT %s FROM %s ORDER BY %s %s q.v LIMIT %d), '
+            'ARRAY(SELECT %s FROM %s ORDER BY %s LIMIT %d) FROM q' % (
+                column, table, column, samples,
+                pk, table, column, operator, k,
+                pk, table, exact % (column, 'q.v'), k
+            )
+        )
+        rows = cur.fetchall()
+    finally:
+        cur.execute('RESET enable_seqscan')
+
+    found = sum(len(set(approximate).intersection(truth)) for approximate, truth in rows)
+    total = sum(len(truth) for _, truth in rows)
+    return found / float(total) if total > 0 else 1.0
+
+
+def reindex(cur, index, concurrently=True):
+    # CONCURRENTLY cannot run inside a transaction block, so use an autocommit connection
+    cur.execute('REINDEX INDEX %s%s' % ('CONCURRENTLY ' if concurrently else '', index))
+
+
+def vacuum(cur, table):
+    # like REINDEX CONCURRENTLY, needs an autocommit connection
+    cur.execute('VACUUM %s' % table)
+
+
+def maintain(cur, index, column, opclass, pk='id', min_recall=0.9, max_dead_ratio=0.2, k=10, samples=20,
+             concurrently=True, dry_run=False):
+    report = index_stats(cur, index)
+    report['recall'] = sampled_recall(cur, report['table'], column, opclass, pk=pk, k=k, samples=samples)
+
+    reasons = []
+    if report['recall'] < min_recall:
+        reasons.append('recall %.3f < %.3f' % (report['recall'], min_recall))
+    if report['dead_ratio'] > max_dead_ratio:
+        reasons.append('dead ratio %.3f > %.3f' % (report['dead_ratio'], max_dead_ratio))
+
+    report['reasons'] = reasons
+    report['vacuumed'] = False
+    report['reindexed'] = False
+    if reasons and not dry_run:
+        if report['dead_ratio'] > max_dead_ratio:
+            # the dead tuples are counted on the table and REINDEX leaves them, so every run would rebuild again
+            vacuum(cur, report['table'])
+            report['vacuumed'] = True
+        reindex(cur, index, concurrently=concurrently)
+        report['reindexed'] = True
+    return report
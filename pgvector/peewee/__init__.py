@@ -1,5 +1,6 @@
 from peewee import Expression, Field, Value
-from ..utils import from_db, to_db
+from ..instrumentation import clock, observe_query
+from ..utils import VectorResult, from_db, from_db_bits, get_codec, to_db, to_db_bits
 
 
 class VectorField(Field):
@@ -7,15 +8,20 @@ class VectorField(Field):
 
     def __init__(self, dimensions=None, *args, **kwargs):
         self.dimensions = dimensions
+        self._codec = get_codec(dimensions) if dimensions else None
         super(VectorField, self).__init__(*args, **kwargs)
 
     def get_modifiers(self):
         return self.dimensions and [self.dimensions] or None
 
     def db_value(self, value):
+        if self._codec is not None:
+            return self._codec.to_db(value)
         return to_db(value)
 
     def python_value(self, value):
+        if self._codec is not None:
+            return self._codec.from_db(value)
         return from_db(value)
 
     def _distance(self, op, vector):
@@ -29,3 +35,43 @@ class VectorField(Field):
 
     def cosine_distance(self, vector):
         return self._distance('<=>', vector)
+
+
+class BitVectorField(Field):
+    field_type = 'int[]'
+
+    def __init__(self, dimensions=None, *args, **kwargs):
+        self.dimensions = dimensions
+        super(BitVectorField, self).__init__(*args, **kwargs)
+
+    def db_value(self, value):
+        return to_db_bits(value, self.dimensions)
+
+    def python_value(self, value):
+        return from_db_bits(value, self.dimensions)
+
+    def hamming_distance(self, vector):
+        return Expression(lhs=self, op='<+>', rhs=self.to_value(vector))
+
+
+def columnar(query, dim=None):
+    # query selects (id, distance) or (id, distance, embedding); runs without per-row conversion
+    cursor = query.model._meta.database.execute(query)
+    return VectorResult.from_rows(cursor.fetchall(), dim)
+
+
+def instrument(database):
+    # records the latency of nearest neighbor queries while a recorder is set
+    execute_sql = database.execute_sql
+    if getattr(execute_sql, 'instrumented', False):
+        return
+
+    def instrumented(sql, params=None, *args, **kwargs):
+        start = clock()
+        cursor = execute_sql(sql, params, *args, **kwargs)
+        if start is not None:
+            observe_query(sql, start)
+        return cursor
+
+    instrumented.instrumented = True
+    database.execute_sql = instrumented
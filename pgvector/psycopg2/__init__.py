@@ -1,24 +1,104 @@
 import numpy as np
 import psycopg2
-from psycopg2.extensions import adapt, new_type, register_adapter, register_type
-from ..utils import from_db, to_db
+from psycopg2.extensions import ISQLQuote, cursor, new_type, register_adapter, register_type
+from ..instrumentation import clock, observe_codec, observe_query
+from ..utils import check_ndarray, from_db, to_db_batch
 
-__all__ = ['register_vector']
+__all__ = ['register_vector', 'adapt_batch', 'instrument']
+
+_formats = {}
+
+
+def _quoted(value, dim=None):
+    # one formatting pass straight to the quoted literal, with the format cached per dimension
+    start = clock()
+    if isinstance(value, np.ndarray):
+        check_ndarray(value)
+        value = value.tolist()
+
+    if dim is not None and len(value) != dim:
+        raise ValueError('expected %d dimensions, not %d' % (dim, len(value)))
+
+    fmt = _formats.get(len(value))
+    if fmt is None:
+        fmt = _formats[len(value)] = "'[" + ','.join(['%.9g'] * len(value)) + "]'"
+    result = (fmt % tuple(value)).encode('ascii')
+    if start is not None:
+        observe_codec('encoded', 'text', 1, len(result), start)
+    return result
 
 
 class VectorAdapter(object):
-    def __init__(self, vector):
+    def __init__(self, vector, dim=None, quoted=None):
         self._vector = vector
+        self._dim = dim
+        self._quoted = quoted
+
+    def __conform__(self, proto):
+        if proto is ISQLQuote:
+            return self
 
     def getquoted(self):
-        return adapt(to_db(self._vector)).getquoted()
+        if self._quoted is None:
+            self._quoted = _quoted(self._vector, self._dim)
+        return self._quoted
+
+
+def adapt_batch(values, dim=None):
+    # validates and formats a whole 2-D batch at once, e.g. for execute_values
+    return [VectorAdapter(None, quoted=("'%s'" % v).encode('ascii')) for v in to_db_batch(values, dim)]
+
+
+class VectorCursor(object):
+    # wraps ndarray parameters for connections registered with globally=False
+    dim = None
+
+    def _adapt(self, vars):
+        if vars is None:
+            return vars
+        if isinstance(vars, dict):
+            return {k: VectorAdapter(v, self.dim) if isinstance(v, np.ndarray) else v for k, v in vars.items()}
+        return [VectorAdapter(v, self.dim) if isinstance(v, np.ndarray) else v for v in vars]
+
+    def execute(self, query, vars=None):
+        return super().execute(query, self._adapt(vars))
+
+    def executemany(self, query, vars_list):
+        return super().executemany(query, [self._adapt(v) for v in vars_list])
+
+    def mogrify(self, query, vars=None):
+        return super().mogrify(query, self._adapt(vars))
+
+
+class InstrumentedCursor(object):
+    # records the latency of nearest neighbor queries while a recorder is set
+    def execute(self, query, vars=None):
+        start = clock()
+        result = super().execute(query, vars)
+        if start is not None:
+            observe_query(query, start)
+        return result
+
+    def executemany(self, query, vars_list):
+        # one observation for the whole batch
+        start = clock()
+        result = super().executemany(query, vars_list)
+        if start is not None:
+            observe_query(query, start)
+        return result
+
+
+def instrument(conn):
+    base = conn.cursor_factory or cursor
+    if not issubclass(base, InstrumentedCursor):
+        conn.cursor_factory = type('InstrumentedCursor', (InstrumentedCursor, base), {})
 
 
 def cast_vector(value, cur):
     return from_db(value)
 
 
-def register_vector(conn_or_curs=None):
+def register_vector(conn_or_curs=None, globally=True, dim=None):
     cur = conn_or_curs.cursor() if hasattr(conn_or_curs, 'cursor') else conn_or_curs
 
     try:
@@ -28,5 +108,12 @@ def register_vector(conn_or_curs=None):
         raise psycopg2.ProgrammingError('vector type not found in the database')
 
     vector = new_type((oid,), 'VECTOR', cast_vector)
-    register_type(vector)
-    register_adapter(np.ndarray, VectorAdapter)
\ No newline at end of file
+
+    if globally:
+        register_type(vector)
+        register_adapter(np.ndarray, VectorAdapter)
+    else:
+        conn = cur.connection
+        register_type(vector, conn)
+        base = conn.cursor_factory or cursor
+        conn.cursor_factory = type('VectorCursor', (VectorCursor, base), {'dim': dim})
@@ -0,0 +1,160 @@
+import hashlib
+import json
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from ..utils import validate_batch
+
+__all__ = ['ReembedJob']
+
+
+def _close(conn):
+    conn.close()
+
+
+class ReembedJob(object):
+    # rows are (re)embedded when md5('<model>:<source>') differs from hash_column, so changing
+    # the model or the source text marks them, and interrupted runs pick up where they stopped
+    def __init__(self, connect, table, source, embedding, hash_column, model, pk='id', embed=None,
+                 cast='real[]', batch_size=100, workers=1, checkpoint=None, progress=None, release=_close):
+        self.connect = connect
+        self.release = release
+        self.table = table
+        self.source = source
+        self.embedding = embedding
+        self.hash_column = hash_column
+        self.model = model
+        self.pk = pk
+        self.embed = embed
+        self.cast = cast
+        self.batch_size = batch_size
+        self.workers = workers
+        self.checkpoint = checkpoint
+        self.progress = progress
+        self.prefix = model + ':'
+
+    def source_hash(self, text):
+        return hashlib.md5((self.prefix + text).encode('utf-8')).hexdigest()
+
+    def run(self):
+        state = self._load_checkpoint()
+        last_pk = state['last_pk']
+        stats = {'rows': state['rows'], 'last_pk': last_pk, 'elapsed': 0.0, 'rows_per_second': 0.0}
+        started = perf_counter()
+
+        conn = self.connect()
+        pending = deque()
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                while True:
+                    rows = self._fetch(conn, last_pk)
+                    if not rows:
+                        break
+                    last_pk = rows[-1][0]
+                    pending.append((last_pk, executor.submit(self._process, rows)))
+
+                    # bound the work in flight and checkpoint only fully completed prefixes
+                    while pending and (len(pending) > self.workers or pending[0][1].done()):
+                        self._complete(pending.popleft(), stats, started)
+
+                while pending:
+                    self._complete(pending.popleft(), stats, started)
+
+            # a finished run must not make the next one skip rows below last_pk
+            self._clear_checkpoint()
+        finally:
+            self.release(conn)
+
+        return stats
+
+    def _complete(self, item, stats, started):
+        pk, future = item
+        stats['rows'] += future.result()
+        stats['last_pk'] = pk
+        stats['elapsed'] = perf_counter() - started
+        stats['rows_per_second'] = stats['rows'] / stats['elapsed'] if stats['elapsed'] > 0 else 0.0
+        self._save_checkpoint(stats)
+        if self.progress is not None:
+            self.progress(dict(stats))
+
+    def _fetch(self, conn, last_pk):
+        sql = 'SELECT %s, %s FROM %s WHERE %s IS NOT NULL AND %s IS DISTINCT FROM md5(%%s || %s)' % (
+            self.pk, self.source, self.table, self.source, self.hash_column, self.source
+        )
+        params = [self.prefix]
+        if last_pk is not None:
+            sql += ' AND %s > %%s' % self.pk
+            params.append(last_pk)
+        sql += ' ORDER BY %s LIMIT %d' % (self.pk, self.batch_size)
+
+        cur = conn.cursor()
+        try:
+            cur.execute(sql, params)
+            return cur.fetchall()
+        finally:
+            cur.close()
+            # otherwise the connection stays idle in transaction for the whole run, holding a lock on the table
+            conn.commit()
+
+    def _process(self, rows):
+        conn = self.connect()
+        try:
+            cur = conn.cursor()
+            if self.embed is None:
+                self._update_server(cur, rows)
+            else:
+                self._update_client(cur, rows)
+            count = cur.rowcount
+            cur.close()
+            conn.commit()
+            return count
+        finally:
+            self.release(conn)
+
+    def _update_server(self, cur, rows):
+        sql = 'UPDATE %s SET %s = text_embedding(%%s, %s)::%s, %s = md5(%%s || %s) WHERE %s = ANY(%%s) AND %s IS DISTINCT FROM md5(%%s || %s)' % (
+            self.table, self.embedding, self.source, self.cast, self.hash_column, self.source, self.pk, self.hash_column, self.source
+        )
+        cur.execute(sql, (self.model, self.prefix, [v[0] for v in rows], self.prefix))
+
+    def _update_client(self, cur, rows):
+        texts = [v[1] for v in rows]
+        embeddings = validate_batch(self.embed(texts))
+        if len(embeddings) != len(rows):
+            raise ValueError('expected %d embeddings, not %d' % (len(rows), len(embeddings)))
+
+        # arrays go over as text literals so the whole batch is one UPDATE
+        fmt = ','.join(['%.9g'] * embeddings.shape[1])
+        if self.cast.endswith('[]'):
+            fmt = '{' + fmt + '}'
+        else:
+            fmt = '[' + fmt + ']'
+        literals = [fmt % tuple(v) for v in embeddings.tolist()]
+
+        sql = 'UPDATE %s AS t SET %s = d.embedding::%s, %s = d.hash FROM unnest(%%s, %%s::text[], %%s::text[]) AS d(pk, embedding, hash) WHERE t.%s = d.pk' % (
+            self.table, self.embedding, self.cast, self.hash_column, self.pk
+        )
+        cur.execute(sql, ([v[0] for v in rows], literals, [self.source_hash(t) for t in texts]))
+
+    def _load_checkpoint(self):
+        if self.checkpoint is None or not os.path.exists(self.checkpoint):
+            return {'last_pk': None, 'rows': 0}
+        with open(self.checkpoint, 'r') as f:
+            state = json.load(f)
+        # a checkpoint from another model says nothing about this run
+        if state.get('model') != self.model:
+            return {'last_pk': None, 'rows': 0}
+        return state
+
+    def _save_checkpoint(self, stats):
+        if self.checkpoint is None:
+            return
+        tmp = self.checkpoint + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'model': self.model, 'last_pk': stats['last_pk'], 'rows': stats['rows']}, f)
+        os.replace(tmp, self.checkpoint)
+
+    def _clear_checkpoint(self):
+        if self.checkpoint is not None and os.path.exists(self.checkpoint):
+            os.remove(self.checkpoint)
@@ -0,0 +1,69 @@
+from itertools import count
+from threading import Lock
+from time import monotonic
+
+__all__ = ['ReplicaSelector', 'DISTANCE_OPERATORS', 'LAG_SQL']
+
+DISTANCE_OPERATORS = ('<->', '<#>', '<=>', '<+>')
+
+# a replica that has replayed everything it received is caught up, even if the primary is idle
+LAG_SQL = (
+    'SELECT CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+    'ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END'
+)
+
+
+class ReplicaSelector(object):
+    def __init__(self, replicas, lag=None, max_lag=None, check_interval=5):
+        self.replicas = list(replicas)
+        self.lag = lag
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._healthy = list(self.replicas)
+        self._checked_at = None
+        self._counter = count()
+        self._lock = Lock()
+
+    def choose(self, check=True):
+        # returns None when no replica is usable so the caller falls back to the primary;
+        # check=False uses the last health check, for callers that probe on their own
+        healthy = self.healthy() if check else self._healthy
+        if not healthy:
+            return None
+        return healthy[next(self._counter) % len(healthy)]
+
+    def healthy(self):
+        # one caller probes while the others keep using the last result, so a replica
+        # waiting on a connect timeout never blocks them
+        if self.due():
+            self.update([replica for replica in self.replicas if self._is_healthy(replica)])
+        return self._healthy
+
+    def due(self):
+        # claims the next health check, so only one caller per interval gets True
+        if self.lag is None:
+            return False
+        with self._lock:
+            now = monotonic()
+            if self._checked_at is not None and now - self._checked_at < self.check_interval:
+                return False
+            self._checked_at = now
+            return True
+
+    def update(self, healthy):
+        with self._lock:
+            self._healthy = list(healthy)
+
+    def mark_failed(self, replica):
+        with self._lock:
+            self._healthy = [v for v in self._healthy if v != replica]
+
+    def acceptable(self, lag):
+        return lag is not None and (self.max_lag is None or float(lag) <= self.max_lag)
+
+    def _is_healthy(self, replica):
+        try:
+            lag = self.lag(replica)
+        except Exception:
+            return False
+        return self.acceptable(lag)
@@ -0,0 +1,171 @@
+import asyncio
+import heapq
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, wait
+from itertools import islice
+from threading import Lock
+import numpy as np
+
+__all__ = ['Shard', 'AsyncShard', 'ShardedSearch', 'Hit', 'SearchResult']
+
+Hit = namedtuple('Hit', ['distance', 'shard', 'row'])
+SearchResult = namedtuple('SearchResult', ['hits', 'failed'])
+
+
+def _params(vector):
+    if isinstance(vector, np.ndarray):
+        return vector.tolist()
+    return list(vector)
+
+
+def _select(table, column, operator, columns, cast, placeholders):
+    vector = placeholders[0] + ('::' + cast if cast else '')
+    return 'SELECT %s %s %s AS distance, %s FROM %s ORDER BY 1 LIMIT %s' % (
+        column, operator, vector, ', '.join(columns), table, placeholders[1]
+    )
+
+
+class Shard(object):
+    # a partition reachable through a DB-API connection, queried from a worker thread.
+    # conn can also be a pool with getconn and putconn (psycopg2.pool, psycopg_pool), so
+    # concurrent searches each get a connection; a single connection runs them one at a time
+    def __init__(self, conn, table, column='embedding', operator='<->', columns=('id',), cast=None):
+        self.conn = conn
+        self.sql = _select(table, column, operator, columns, cast, ('%s', '%s'))
+        self._pooled = hasattr(conn, 'getconn')
+        self._lock = Lock()
+        # token -> connection running its query, or None while waiting for one
+        self._running = {}
+        self._running_lock = Lock()
+
+    def __call__(self, vector, k, token=None):
+        if token is None:
+            token = object()
+        with self._running_lock:
+            self._running[token] = None
+
+        try:
+            if self._pooled:
+                conn = self.conn.getconn()
+                try:
+                    return self._query(conn, vector, k, token)
+                finally:
+                    self.conn.putconn(conn)
+
+            with self._lock:
+                return self._query(self.conn, vector, k, token)
+        finally:
+            with self._running_lock:
+                self._running.pop(token, None)
+
+    def _query(self, conn, vector, k, token):
+        with self._running_lock:
+            if token not in self._running:
+                raise TimeoutError('cancelled before it started')
+            self._running[token] = conn
+
+        cur = conn.cursor()
+        try:
+            cur.execute(self.sql, (_params(vector), k))
+            return cur.fetchall()
+        finally:
+            # from here on the connection may run another caller's query
+            with self._running_lock:
+                if token in self._running:
+                    self._running[token] = None
+            cur.close()
+            # ends the transaction, so the partition is not left locked while the connection is idle
+            if not getattr(conn, 'autocommit', True):
+                conn.rollback()
+
+    def cancel(self, token):
+        # called from another thread when a query runs past the timeout; only stops that call
+        with self._running_lock:
+            conn = self._running.pop(token, None)
+            if conn is not None:
+                conn.cancel()
+
+
+class AsyncShard(object):
+    # a partition reachable through an asyncpg connection or pool
+    def __init__(self, conn, table, column='embedding', operator='<->', columns=('id',), cast=None):
+        self.conn = conn
+        self.sql = _select(table, column, operator, columns, cast, ('$1', '$2'))
+
+    async def __call__(self, vector, k):
+        return await self.conn.fetch(self.sql, _params(vector), k)
+
+
+def _hits(name, rows):
+    return (Hit(row[0], name, tuple(row[1:])) for row in rows)
+
+
+def _merge(results, k):
+    # each shard returns rows ordered by distance, so a k-way heap merge is enough
+    streams = [_hits(name, rows) for name, rows in results.items()]
+    return list(islice(heapq.merge(*streams, key=lambda v: v.distance), k))
+
+
+class ShardedSearch(object):
+    def __init__(self, shards, timeout=None, partial=True, max_workers=None):
+        self.shards = dict(shards)
+        self.timeout = timeout
+        self.partial = partial
+        self.max_workers = max_workers or len(self.shards)
+        self._executor = None
+
+    def search(self, vector, k):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+
+        # shards with a cancel method take a token identifying the call to cancel
+        tokens = {name: object() for name, shard in self.shards.items() if hasattr(shard, 'cancel')}
+        futures = {}
+        for name, shard in self.shards.items():
+            args = (vector, k, tokens[name]) if name in tokens else (vector, k)
+            futures[name] = self._executor.submit(shard, *args)
+        wait(futures.values(), timeout=self.timeout)
+
+        results = {}
+        failed = {}
+        for name, future in futures.items():
+            if not future.done():
+                # a running future cannot be cancelled, so stop the query to free its worker and connection
+                if not future.cancel() and name in tokens:
+                    self.shards[name].cancel(tokens[name])
+                failed[name] = TimeoutError('shard %s timed out' % name)
+            elif future.exception() is not None:
+                failed[name] = future.exception()
+            else:
+                results[name] = future.result()
+
+        return self._result(results, failed, k)
+
+    async def asearch(self, vector, k):
+        names = list(self.shards)
+        outcomes = await asyncio.gather(
+            *[asyncio.wait_for(self.shards[name](vector, k), self.timeout) for name in names],
+            return_exceptions=True
+        )
+
+        results = {}
+        failed = {}
+        for name, outcome in zip(names, outcomes):
+            if isinstance(outcome, asyncio.TimeoutError):
+                failed[name] = TimeoutError('shard %s timed out' % name)
+            elif isinstance(outcome, BaseException):
+                failed[name] = outcome
+            else:
+                results[name] = outcome
+
+        return self._result(results, failed, k)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def _result(self, results, failed, k):
+        if failed and not self.partial:
+            raise next(iter(failed.values()))
+        return SearchResult(_merge(results, k), failed)
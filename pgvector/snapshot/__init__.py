@@ -0,0 +1,208 @@
+import json
+import os
+import numpy as np
+from ..utils import from_db_batch
+
+__all__ = ['Snapshot']
+
+META_FILE = 'meta.json'
+IDS_FILE = 'ids.i8'
+VECTORS_FILE = 'vectors.f4'
+REWRITE_ROWS = 65536
+
+
+def _watermark(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+class Snapshot(object):
+    # ids are kept sorted so rows can be located with a binary search;
+    # vectors are raw little-endian float32 rows in the same order.
+    # A rewrite goes to the next generation's files, which meta.json switches to in one step
+    def __init__(self, path, dim=None):
+        self.path = path
+        self._stale = []
+        os.makedirs(path, exist_ok=True)
+
+        meta_path = os.path.join(path, META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path, 'r') as f:
+                self.meta = json.load(f)
+            if dim is not None and self.meta['dim'] != dim:
+                raise ValueError('expected %d dimensions, not %d' % (self.meta['dim'], dim))
+        else:
+            if dim is None:
+                raise ValueError('dim required for a new snapshot')
+            self.meta = {'dim': dim, 'count': 0, 'last_key': None, 'watermark': None, 'generation': 0}
+            self._write_meta()
+
+        self._ids = None
+        self._vectors = None
+
+    @property
+    def dim(self):
+        return self.meta['dim']
+
+    def __len__(self):
+        return self.meta['count']
+
+    @property
+    def ids(self):
+        if self._ids is None:
+            self._ids = self._map(IDS_FILE, '<i8', (len(self),))
+        return self._ids
+
+    @property
+    def vectors(self):
+        if self._vectors is None:
+            self._vectors = self._map(VECTORS_FILE, '<f4', (len(self), self.dim))
+        return self._vectors
+
+    def get(self, ids):
+        ids = np.asarray(ids, dtype=np.int64)
+        pos = np.searchsorted(self.ids, ids)
+        found = pos < len(self)
+        found[found] = self.ids[pos[found]] == ids[found]
+        if not found.all():
+            raise KeyError(ids[~found].tolist())
+        return self.vectors[pos]
+
+    def sync(self, cursor, table, column, key='id', updated_at=None, batch_size=10000, overlap=None):
+        # without updated_at, only rows with a key past the last synced one are pulled;
+        # with it, changed rows are pulled too (deletes are never seen). Rows at the
+        # watermark are pulled again, and overlap (e.g. a timedelta) reaches further back
+        # for transactions that commit after later ones; merging a row twice is harmless
+        if updated_at is None:
+            select = 'SELECT %s, %s FROM %s WHERE %s IS NOT NULL' % (key, column, table, column)
+            last = self.meta['last_key']
+            params = ()
+            if last is not None:
+                select += ' AND %s > %%s' % key
+                params = (last,)
+            select += ' ORDER BY %s' % key
+        else:
+            select = 'SELECT %s, %s, %s FROM %s WHERE %s IS NOT NULL' % (key, column, updated_at, table, column)
+            last = self.meta['watermark']
+            params = ()
+            if last is not None:
+                if overlap is None:
+                    select += ' AND %s >= %%s' % updated_at
+                    params = (last,)
+                else:
+                    select += ' AND %s >= %%s - %%s' % updated_at
+                    params = (last, overlap)
+            select += ' ORDER BY %s, %s' % (updated_at, key)
+
+        cursor.execute(select, params)
+
+        synced = 0
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+
+            ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+            self._merge(ids, from_db_batch([row[1] for row in rows], self.dim))
+            synced += len(rows)
+
+            if updated_at is None:
+                self.meta['last_key'] = int(ids[-1])
+            else:
+                self.meta['watermark'] = _watermark(rows[-1][2])
+                self.meta['last_key'] = int(self.ids[-1])
+            self._write_meta()
+
+        return synced
+
+    def _merge(self, ids, vectors):
+        count = len(self)
+
+        if count > 0:
+            pos = np.searchsorted(self.ids, ids)
+            found = pos < count
+            found[found] = self.ids[pos[found]] == ids[found]
+            if found.any():
+                existing = self._map(VECTORS_FILE, '<f4', (count, self.dim), mode='r+')
+                existing[pos[found]] = vectors[found]
+                existing.flush()
+                del existing
+            ids = ids[~found]
+            vectors = vectors[~found]
+
+        if len(ids) == 0:
+            return
+
+        order = np.argsort(ids, kind='stable')
+        ids = ids[order]
+        vectors = vectors[order]
+
+        if count == 0 or ids[0] > self.ids[-1]:
+            self._append(ids, vectors)
+        else:
+            self._rewrite(ids, vectors)
+
+    def _append(self, ids, vectors):
+        count = len(self)
+        self._write_at(IDS_FILE, count * 8, ids.astype('<i8').tobytes())
+        self._write_at(VECTORS_FILE, count * self.dim * 4, np.ascontiguousarray(vectors, dtype='<f4').tobytes())
+        self._resize(count + len(ids))
+
+    def _write_at(self, name, offset, data):
+        # anything past the published count was left by an append that never finished
+        path = self._path(name)
+        with open(path, 'r+b' if os.path.exists(path) else 'wb') as f:
+            f.truncate(offset)
+            f.seek(offset)
+            f.write(data)
+
+    def _rewrite(self, ids, vectors):
+        # merges the sorted new rows into a copy, a block of existing rows at a time
+        count = len(self)
+        generation = self.meta.get('generation', 0) + 1
+        insert = np.searchsorted(self.ids, ids)
+        with open(self._path(IDS_FILE, generation), 'wb') as ids_file, open(self._path(VECTORS_FILE, generation), 'wb') as vectors_file:
+            for start in range(0, count, REWRITE_ROWS):
+                stop = min(start + REWRITE_ROWS, count)
+                first, last = np.searchsorted(insert, [start, stop])
+                if stop == count:
+                    last = len(ids)
+                block_ids = np.concatenate([self.ids[start:stop], ids[first:last]])
+                block_vectors = np.concatenate([self.vectors[start:stop], vectors[first:last]])
+                order = np.argsort(block_ids, kind='stable')
+                ids_file.write(block_ids[order].astype('<i8').tobytes())
+                vectors_file.write(block_vectors[order].astype('<f4').tobytes())
+
+        # removed once meta.json no longer points at them
+        self._stale += [self._path(IDS_FILE), self._path(VECTORS_FILE)]
+        self.meta['generation'] = generation
+        self._resize(count + len(ids))
+
+    def _resize(self, count):
+        self.meta['count'] = count
+        self._ids = None
+        self._vectors = None
+
+    def _path(self, name, generation=None):
+        if generation is None:
+            generation = self.meta.get('generation', 0)
+        if generation > 0:
+            root, ext = os.path.splitext(name)
+            name = '%s.%d%s' % (root, generation, ext)
+        return os.path.join(self.path, name)
+
+    def _map(self, name, dtype, shape, mode='r'):
+        if shape[0] == 0:
+            return np.empty(shape, dtype=dtype)
+        return np.memmap(self._path(name), dtype=dtype, mode=mode, shape=shape)
+
+    def _write_meta(self):
+        # readers only see rows once the count is published
+        tmp = os.path.join(self.path, META_FILE + '.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(self.meta, f)
+        os.replace(tmp, os.path.join(self.path, META_FILE))
+
+        while self._stale:
+            os.remove(self._stale.pop())
@@ -1,8 +1,20 @@
+from sqlalchemy import event, func, select, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.dialects.postgresql.base import ischema_names
-from sqlalchemy.types import UserDefinedType, Float
-from ..utils import from_db, to_db
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import visitors
+from sqlalchemy.sql.elements import BinaryExpression
+from sqlalchemy.sql.selectable import Select, TableClause
+from sqlalchemy.types import Float, Integer, TypeDecorator, UserDefinedType
+from ..cache import default_cache, invalidate, written_table
+from ..instrumentation import clock, observe_query
+from ..maintenance import maintain
+from ..reembed import ReembedJob
+from ..routing import DISTANCE_OPERATORS, LAG_SQL, ReplicaSelector
+from ..utils import VectorResult, from_db, from_db_batch, from_db_bits, get_codec, to_db, to_db_bits
 
-__all__ = ['Vector']
+__all__ = ['Vector', 'BitVector', 'RoutingSession', 'cached', 'enable_cache_invalidation', 'reembed_job', 'grouped_centroids', 'columnar', 'maintain_index', 'enable_instrumentation']
 
 
 class Vector(UserDefinedType):
@@ -18,11 +30,17 @@ class Vector(UserDefinedType):
         return "VECTOR(%d)" % self.dim
 
     def bind_processor(self, dialect):
+        if self.dim is not None:
+            return get_codec(self.dim).to_db
+
         def process(value):
-            return to_db(value, self.dim)
+            return to_db(value)
         return process
 
     def result_processor(self, dialect, coltype):
+        if self.dim is not None:
+            return get_codec(self.dim).from_db
+
         def process(value):
             return from_db(value)
         return process
@@ -38,5 +56,187 @@ class Vector(UserDefinedType):
             return self.op('<=>', return_type=Float)(other)
 
 
+class BitVector(TypeDecorator):
+    # bit vectors packed 32 bits per integer, compared with the Lantern hamming operator
+    impl = ARRAY(Integer)
+    cache_ok = True
+
+    def __init__(self, dim=None):
+        super().__init__()
+        self.dim = dim
+
+    def process_bind_param(self, value, dialect):
+        return to_db_bits(value, self.dim)
+
+    def process_result_value(self, value, dialect):
+        return from_db_bits(value, self.dim)
+
+    class comparator_factory(ARRAY.Comparator):
+        def hamming_distance(self, other):
+            return self.op('<+>', return_type=Integer)(other)
+
+
+def has_distance(clause):
+    for element in visitors.iterate(clause):
+        if isinstance(element, BinaryExpression) and getattr(element.operator, 'opstring', None) in DISTANCE_OPERATORS:
+            return True
+    return False
+
+
+def replica_lag(engine):
+    with engine.connect() as conn:
+        return conn.execute(text(LAG_SQL)).scalar()
+
+
+class RoutingSession(Session):
+    # sends SELECTs with a distance operator to a replica, everything else to the primary
+    def __init__(self, bind=None, replicas=None, max_lag=None, check_interval=5, **kwargs):
+        super().__init__(bind=bind, **kwargs)
+        self.replicas = replicas or {}
+        self.selector = ReplicaSelector(
+            self.replicas,
+            lag=lambda name: replica_lag(self.replicas[name]),
+            max_lag=max_lag,
+            check_interval=check_interval
+        )
+        self._replica = None
+        self._primary_only = False
+        event.listen(self, 'do_orm_execute', self._fallback)
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        self._replica = None
+        if not self._flushing and not self._primary_only and isinstance(clause, Select) and has_distance(clause):
+            replica = self.selector.choose()
+            if replica is not None:
+                self._replica = replica
+                return self.replicas[replica]
+        return super().get_bind(mapper, clause=clause, **kwargs)
+
+    def _fallback(self, orm_execute_state):
+        # a replica that went down since the last health check is skipped and the query rerun on the primary
+        if not orm_execute_state.is_select:
+            return None
+        try:
+            return orm_execute_state.invoke_statement()
+        except OperationalError:
+            replica = self._replica
+            if replica is None:
+                raise
+            self.selector.mark_failed(replica)
+            self._primary_only = True
+            try:
+                return orm_execute_state.invoke_statement()
+            finally:
+                self._primary_only = False
+
+
+def cached(session, statement, cache=None):
+    # rows are shared between callers, so prefer selecting columns over ORM entities
+    if cache is None:
+        cache = default_cache
+
+    bind = session.get_bind(clause=statement)
+    compiled = statement.compile(dialect=bind.dialect)
+    key = cache.key(str(session.get_bind().url), str(compiled), compiled.params)
+    result = cache.get(key)
+    if result is None:
+        tables = {v.name for v in visitors.iterate(statement) if isinstance(v, TableClause)}
+        versions = cache.versions(tables)
+        result = session.execute(statement).all()
+        # uncommitted rows would be served to other sessions even if this transaction rolls back
+        if not _pending_writes(session):
+            cache.set(key, versions, result)
+    return list(result)
+
+
+def _record_write(conn, cursor, statement, parameters, context, executemany):
+    table = written_table(statement)
+    if table is not None:
+        invalidate(table)
+        conn.info.setdefault('pgvector_written', set()).add(table)
+
+
+def _pending_writes(session):
+    # writes go to the primary, which is the default bind of a RoutingSession
+    return session.in_transaction() and bool(session.connection().info.get('pgvector_written'))
+
+
+def _invalidate_committed(conn):
+    for table in conn.info.pop('pgvector_written', ()):
+        invalidate(table)
+
+
+def _discard_written(conn):
+    conn.info.pop('pgvector_written', None)
+
+
+def enable_cache_invalidation(engine):
+    event.listen(engine, 'after_cursor_execute', _record_write)
+    event.listen(engine, 'commit', _invalidate_committed)
+    event.listen(engine, 'rollback', _discard_written)
+
+
+def _start_query(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('pgvector_query_start', []).append(clock())
+
+
+def _end_query(conn, cursor, statement, parameters, context, executemany):
+    start = conn.info['pgvector_query_start'].pop()
+    if start is not None:
+        observe_query(statement, start)
+
+
+def _discard_query(context):
+    # failed statements never reach after_cursor_execute
+    if context.connection is not None and context.connection.info.get('pgvector_query_start'):
+        context.connection.info['pgvector_query_start'].pop()
+
+
+def enable_instrumentation(engine):
+    # nearest neighbor query latency; codec metrics need no setup
+    event.listen(engine, 'before_cursor_execute', _start_query)
+    event.listen(engine, 'after_cursor_execute', _end_query)
+    event.listen(engine, 'handle_error', _discard_query)
+
+
+def reembed_job(engine, model, source, embedding, hash_column, embedding_model, **kwargs):
+    table = model.__table__
+    return ReembedJob(
+        engine.raw_connection,
+        table.fullname,
+        table.c[source].name,
+        table.c[embedding].name,
+        table.c[hash_column].name,
+        embedding_model,
+        pk=table.primary_key.columns.values()[0].name,
+        **kwargs
+    )
+
+
+def grouped_centroids(session, group_column, embedding_column):
+    # averaged server-side with GROUP BY, so only one row per group is transferred
+    rows = session.execute(select(group_column, func.avg(embedding_column)).group_by(group_column)).all()
+    return [v[0] for v in rows], from_db_batch([v[1] for v in rows], embedding_column.type.dim)
+
+
+def columnar(session, statement, dim=None):
+    # statement selects (id, distance) or (id, distance, embedding)
+    return VectorResult.from_rows(session.execute(statement).tuples(), dim)
+
+
+def maintain_index(engine, index, **kwargs):
+    # runs in autocommit so REINDEX CONCURRENTLY is allowed
+    column = index.expressions[0]
+    default = 'vector_l2_ops' if isinstance(column.type, Vector) else 'dist_l2sq_ops'
+    opclass = index.dialect_options['postgresql']['ops'].get(column.key, default)
+    pk = index.table.primary_key.columns.values()[0].name
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        cursor = conn.connection.cursor()
+        try:
+            return maintain(cursor, index.name, column.name, opclass, pk=pk, **kwargs)
+        finally:
+            cursor.close()
+
+
 # for reflection
 ischema_names['vector'] = Vector
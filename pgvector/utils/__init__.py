@@ -1,5 +1,54 @@
+from functools import lru_cache
 import numpy as np
-from struct import pack, unpack
+from struct import Struct, pack, unpack
+from ..instrumentation import clock, observe_codec
+
+
+class InvalidVectorsError(ValueError):
+    def __init__(self, message, rows):
+        super().__init__(message)
+        self.rows = rows
+
+
+def check_ndarray(value, ndim=1):
+    if value.ndim != ndim:
+        raise ValueError('expected ndim to be %d' % ndim)
+
+    if not np.issubdtype(value.dtype, np.integer) and not np.issubdtype(value.dtype, np.floating):
+        raise ValueError('dtype must be numeric')
+
+
+def validate_batch(values, dim=None, normalize=False, dtype=np.float32):
+    # checks a whole 2-D batch at once and reports every offending row
+    if not isinstance(values, np.ndarray):
+        lengths = np.fromiter((len(v) for v in values), dtype=np.int64, count=len(values))
+        expected = dim if dim is not None else (lengths[0] if len(lengths) > 0 else 0)
+        bad = np.flatnonzero(lengths != expected)
+        if len(bad) > 0:
+            raise InvalidVectorsError('expected %d dimensions in rows %s' % (expected, bad.tolist()), bad.tolist())
+        values = np.array(values)
+        if values.ndim == 1:
+            values = values.reshape(len(lengths), expected)
+
+    check_ndarray(values, ndim=2)
+
+    if dim is not None and values.shape[1] != dim:
+        raise ValueError('expected %d dimensions, not %d' % (dim, values.shape[1]))
+
+    values = values.astype(dtype, copy=False)
+
+    bad = np.flatnonzero(~np.isfinite(values).all(axis=1))
+    if len(bad) > 0:
+        raise InvalidVectorsError('non-finite values in rows %s' % bad.tolist(), bad.tolist())
+
+    if normalize:
+        norms = np.linalg.norm(values, axis=1)
+        bad = np.flatnonzero(norms == 0)
+        if len(bad) > 0:
+            raise InvalidVectorsError('cannot normalize zero vectors in rows %s' % bad.tolist(), bad.tolist())
+        values = (values / norms[:, np.newaxis]).astype(dtype, copy=False)
+
+    return values
 
 
 def from_db(value):
@@ -7,43 +56,344 @@ def from_db(value):
     if value is None or isinstance(value, np.ndarray):
         return value
 
-    return np.array(value[1:-1].split(','), dtype=np.float32)
+    start = clock()
+    result = np.array(value[1:-1].split(','), dtype=np.float32)
+    if start is not None:
+        observe_codec('decoded', 'text', 1, len(value), start)
+    return result
+
+
+def null_mask(values):
+    return np.fromiter((v is None for v in values), dtype=bool, count=len(values))
+
+
+def from_db_batch(values, dim=None):
+    # decode many rows into a single 2-D matrix instead of one ndarray per row; NULLs become rows of NaN
+    if len(values) == 0:
+        return np.empty((0, dim or 0), dtype=np.float32)
+
+    nulls = null_mask(values)
+    if nulls.any():
+        decoded = from_db_batch([v for v in values if v is not None], dim)
+        matrix = np.full((len(values), decoded.shape[1]), np.nan, dtype=np.float32)
+        matrix[~nulls] = decoded
+        return matrix
+
+    start = clock()
+    first = values[0]
+    if isinstance(first, str):
+        # real[] columns do not enforce a dimension, so rows are counted before the reshape
+        lengths = np.fromiter((v.count(',') + 1 for v in values), dtype=np.int64, count=len(values))
+    else:
+        lengths = np.fromiter((len(v) for v in values), dtype=np.int64, count=len(values))
+    expected = lengths[0]
+    bad = np.flatnonzero(lengths != expected)
+    if len(bad) > 0:
+        raise InvalidVectorsError('expected %d dimensions in rows %s' % (expected, bad.tolist()), bad.tolist())
+
+    if isinstance(first, str):
+        matrix = np.array(','.join([v[1:-1] for v in values]).split(','), dtype=np.float32)
+        matrix = matrix.reshape(len(values), expected)
+    else:
+        matrix = np.asarray(values, dtype=np.float32)
+
+    if dim is not None and matrix.shape[1] != dim:
+        raise ValueError('expected %d dimensions, not %d' % (dim, matrix.shape[1]))
+
+    # rows that the driver already decoded were counted by its loader, if at all
+    if start is not None and isinstance(first, str):
+        observe_codec('decoded', 'text', len(values), sum([len(v) for v in values]), start)
+    return matrix
+
+
+class VectorResult(object):
+    # one array per column instead of an object and an ndarray per row
+    # nulls marks the rows whose embedding is NULL; they are NaN in embeddings
+    __slots__ = ('ids', 'distances', 'embeddings', 'nulls')
+
+    def __init__(self, ids, distances, embeddings=None, nulls=None):
+        self.ids = ids
+        self.distances = distances
+        self.embeddings = embeddings
+        self.nulls = nulls
+
+    @classmethod
+    def from_rows(cls, rows, dim=None):
+        # rows are (id, distance) or (id, distance, embedding)
+        rows = list(rows)
+        width = len(rows[0]) if rows else (3 if dim is not None else 2)
+        columns = list(zip(*rows)) if rows else [()] * width
+
+        ids = np.array(columns[0])
+        distances = np.array(columns[1], dtype=np.float64)
+        if width > 2:
+            return cls(ids, distances, from_db_batch(columns[2], dim), null_mask(columns[2]))
+        return cls(ids, distances)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __repr__(self):
+        return 'VectorResult(%d rows)' % len(self)
 
 
 def from_db_binary(value):
     if value is None:
         return value
 
+    start = clock()
     (dim, unused) = unpack('>HH', value[:4])
-    return np.frombuffer(value, dtype='>f', count=dim, offset=4).astype(dtype=np.float32)
+    result = np.frombuffer(value, dtype='>f', count=dim, offset=4).astype(dtype=np.float32)
+    if start is not None:
+        observe_codec('decoded', 'binary', 1, len(value), start)
+    return result
 
 
 def to_db(value, dim=None):
     if value is None:
         return value
 
+    start = clock()
     if isinstance(value, np.ndarray):
-        if value.ndim != 1:
-            raise ValueError('expected ndim to be 1')
-
-        if not np.issubdtype(value.dtype, np.integer) and not np.issubdtype(value.dtype, np.floating):
-            raise ValueError('dtype must be numeric')
-
+        check_ndarray(value)
         value = value.tolist()
 
     if dim is not None and len(value) != dim:
         raise ValueError('expected %d dimensions, not %d' % (dim, len(value)))
 
-    return '[' + ','.join([str(float(v)) for v in value]) + ']'
+    result = '[' + ','.join([str(float(v)) for v in value]) + ']'
+    if start is not None:
+        observe_codec('encoded', 'text', 1, len(result), start)
+    return result
+
+
+def to_db_batch(values, dim=None, normalize=False):
+    start = clock()
+    values = validate_batch(values, dim, normalize)
+    # 9 significant digits round-trip float32 exactly
+    fmt = '[' + ','.join(['%.9g'] * values.shape[1]) + ']'
+    result = [fmt % tuple(row) for row in values.tolist()]
+    if start is not None:
+        observe_codec('encoded', 'text', len(result), sum([len(v) for v in result]), start)
+    return result
 
 
 def to_db_binary(value):
     if value is None:
         return value
 
+    start = clock()
     value = np.asarray(value, dtype='>f')
 
     if value.ndim != 1:
         raise ValueError('expected ndim to be 1')
 
-    return pack('>HH', value.shape[0], 0) + value.tobytes()
+    result = pack('>HH', value.shape[0], 0) + value.tobytes()
+    if start is not None:
+        observe_codec('encoded', 'binary', 1, len(result), start)
+    return result
+
+
+class VectorCodec(object):
+    # everything that depends only on the dimension is built once, at schema time
+    def __init__(self, dim):
+        self.dim = dim
+        self.shape = (dim,)
+        self.header = Struct('>HH').pack(dim, 0)
+        self.binary_size = len(self.header) + 4 * dim
+        self.text_format = '[' + ','.join(['%.9g'] * dim) + ']'
+
+    def _check(self, value):
+        if isinstance(value, np.ndarray):
+            if value.shape != self.shape:
+                check_ndarray(value)
+                raise ValueError('expected %d dimensions, not %d' % (self.dim, len(value)))
+            if value.dtype.kind not in 'iuf':
+                raise ValueError('dtype must be numeric')
+        elif len(value) != self.dim:
+            raise ValueError('expected %d dimensions, not %d' % (self.dim, len(value)))
+
+    def to_db(self, value):
+        if value is None:
+            return value
+
+        start = clock()
+        self._check(value)
+        if isinstance(value, np.ndarray):
+            value = value.tolist()
+        result = self.text_format % tuple(value)
+        if start is not None:
+            observe_codec('encoded', 'text', 1, len(result), start)
+        return result
+
+    def to_db_binary(self, value):
+        if value is None:
+            return value
+
+        start = clock()
+        self._check(value)
+        out = bytearray(self.binary_size)
+        out[:4] = self.header
+        np.frombuffer(out, dtype='>f4', offset=4)[:] = value
+        if start is not None:
+            observe_codec('encoded', 'binary', 1, self.binary_size, start)
+        return bytes(out)
+
+    def from_db(self, value):
+        if value is None or isinstance(value, np.ndarray):
+            return value
+
+        start = clock()
+        result = np.fromstring(value[1:-1], dtype=np.float32, sep=',')
+        if len(result) != self.dim:
+            raise ValueError('expected %d dimensions, not %d' % (self.dim, len(result)))
+        if start is not None:
+            observe_codec('decoded', 'text', 1, len(value), start)
+        return result
+
+    def from_db_binary(self, value):
+        if value is None:
+            return value
+
+        start = clock()
+        if value[:4] != self.header:
+            raise ValueError('expected %d dimensions, not %d' % (self.dim, unpack('>H', value[:2])[0]))
+        result = np.frombuffer(value, dtype='>f4', count=self.dim, offset=4).astype(np.float32)
+        if start is not None:
+            observe_codec('decoded', 'binary', 1, len(value), start)
+        return result
+
+
+@lru_cache(maxsize=None)
+def get_codec(dim):
+    return VectorCodec(dim)
+
+
+def to_db_array_binary(value):
+    # real[] in binary: ndim, has nulls, element oid, then dimension and lower bound,
+    # followed by a length before every element
+    start = clock()
+    value = np.asarray(value)
+    check_ndarray(value)
+
+    elements = np.empty(value.shape[0], dtype=[('len', '>i4'), ('value', '>f4')])
+    elements['len'] = 4
+    elements['value'] = value
+    result = pack('>iiiii', 1, 0, 700, value.shape[0], 1) + elements.tobytes()
+    if start is not None:
+        observe_codec('encoded', 'binary', 1, len(result), start)
+    return result
+
+
+def from_db_array_binary(value):
+    if value is None:
+        return value
+
+    (ndim, has_null, oid) = unpack('>iii', value[:12])
+    if ndim == 0:
+        return np.empty(0, dtype=np.float32)
+    if ndim != 1 or has_null or oid != 700:
+        raise ValueError('expected a one-dimensional real[] without nulls')
+
+    start = clock()
+    (dim,) = unpack('>i', value[12:16])
+    elements = np.frombuffer(value, dtype=[('len', '>i4'), ('value', '>f4')], count=dim, offset=20)
+    result = elements['value'].astype(np.float32)
+    if start is not None:
+        observe_codec('decoded', 'binary', 1, len(value), start)
+    return result
+
+
+class PackedBits(np.ndarray):
+    # int32 elements holding 32 bits each, as returned by pack_bits and from_db_bits;
+    # only values of this type are stored as is, so a plain int32 array of 0/1 bits is still packed
+    pass
+
+
+def pack_bits(values):
+    # 32 bits per int4 element; hamming distance is unchanged since it is a popcount of xor
+    values = np.asarray(values)
+    if values.ndim not in (1, 2):
+        raise ValueError('expected ndim to be 1 or 2')
+
+    packed = np.packbits(values.astype(bool), axis=-1)
+    padding = -packed.shape[-1] % 4
+    if padding:
+        packed = np.pad(packed, [(0, 0)] * (packed.ndim - 1) + [(0, padding)])
+    return np.ascontiguousarray(packed).view('>i4').astype(np.int32).view(PackedBits)
+
+
+def unpack_bits(values, dim=None):
+    values = np.asarray(values, dtype='>i4')
+    return np.unpackbits(values.view(np.uint8), axis=-1, count=dim)
+
+
+def packed_length(dim):
+    return -(-dim // 32)
+
+
+def to_packed_bits(value, dim=None):
+    # PackedBits are already packed; anything else is a vector of 0/1 bits
+    if isinstance(value, PackedBits):
+        if value.ndim != 1:
+            raise ValueError('expected ndim to be 1')
+        if dim is not None and len(value) != packed_length(dim):
+            raise ValueError('expected %d packed elements, not %d' % (packed_length(dim), len(value)))
+        return value
+
+    value = np.asarray(value)
+    if value.ndim != 1:
+        raise ValueError('expected ndim to be 1')
+
+    if dim is not None and len(value) != dim:
+        raise ValueError('expected %d dimensions, not %d' % (dim, len(value)))
+
+    return pack_bits(value)
+
+
+def to_db_bits(value, dim=None):
+    if value is None:
+        return value
+
+    return to_packed_bits(value, dim).tolist()
+
+
+def from_db_bits(value, dim=None):
+    # kept packed, 32 bits per element, so it can go straight to hamming_rerank;
+    # use unpack_bits for one element per bit
+    if value is None:
+        return value
+
+    if isinstance(value, str):
+        value = np.fromstring(value[1:-1], dtype=np.int32, sep=',').view(PackedBits)
+    else:
+        value = np.asarray(value, dtype=np.int32).view(PackedBits)
+
+    if dim is not None and len(value) != packed_length(dim):
+        raise ValueError('expected %d packed elements, not %d' % (packed_length(dim), len(value)))
+    return value
+
+
+if hasattr(np, 'bitwise_count'):
+    def _popcount(values):
+        return np.bitwise_count(values.view(np.uint8))
+else:
+    POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+    def _popcount(values):
+        return POPCOUNT[values.view(np.uint8)]
+
+
+def hamming_distance(query, candidates):
+    query = np.ascontiguousarray(query, dtype=np.int32)
+    candidates = np.ascontiguousarray(candidates, dtype=np.int32)
+    return _popcount(np.bitwise_xor(candidates, query)).sum(axis=-1, dtype=np.int64)
+
+
+def hamming_rerank(query, candidates, k):
+    # takes packed vectors and returns the indices and distances of the k closest candidates
+    distances = hamming_distance(query, candidates)
+    k = min(k, len(distances))
+    top = np.argpartition(distances, k - 1)[:k] if k > 0 else np.empty(0, dtype=np.int64)
+    top = top[np.argsort(distances[top], kind='stable')]
+    return top, distances[top]
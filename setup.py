@@ -4,7 +4,7 @@ with open('README.md', 'r', encoding='utf-8') as fh:
     long_description = fh.read()
 
 setup(
-    name='pgvector',
+    name='lantern-python',
     version='0.0.0',
     description='pgvector support for Python',
     long_description=long_description,
@@ -14,9 +14,20 @@ setup(
     author_email='di@lantern.dev',
     license='MIT',
     packages=[
+        'pgvector.benchmark',
+        'pgvector.bulk',
+        'pgvector.cache',
+        'pgvector.centroids',
+        'pgvector.instrumentation',
+        'pgvector.knn',
+        'pgvector.maintenance',
         'pgvector.peewee',
         'pgvector.psycopg',
         'pgvector.psycopg2',
+        'pgvector.reembed',
+        'pgvector.routing',
+        'pgvector.sharding',
+        'pgvector.snapshot',
         'pgvector.sqlalchemy',
         'pgvector.utils'
     ],
@@ -0,0 +1,37 @@
+import numpy as np
+from pgvector.benchmark import Benchmark, exact_neighbors, parameter_grid, recall
+import psycopg2
+
+conn = psycopg2.connect(
+    dbname='postgres',
+    user='postgres',
+    password='postgres',
+    host='localhost',
+    port='5432'
+)
+
+cur = conn.cursor()
+cur.execute('CREATE EXTENSION IF NOT EXISTS lantern')
+conn.commit()
+
+
+class TestBenchmark:
+    def test_exact_neighbors(self):
+        base = np.array([[1, 1, 1], [2, 2, 2], [1, 1, 2]])
+        assert exact_neighbors(base, [[1, 1, 1]], 3).tolist() == [[0, 2, 1]]
+        assert sorted(exact_neighbors(base, [[1, 1, 1]], 2, metric='cosine')[0]) == [0, 1]
+
+    def test_recall(self):
+        assert recall([[1, 2], [3, 4]], [[1, 2], [3, 5]]) == 0.75
+
+    def test_run(self):
+        base = np.random.rand(200, 8)
+        queries = np.random.rand(5, 8)
+        benchmark = Benchmark(conn, base, queries)
+        benchmark.load()
+        results = benchmark.run(parameter_grid(m=[4, 8], ef_construction=[32], ef=[32]), k=5)
+        assert [v['m'] for v in results] == [4, 8]
+        for result in results:
+            assert 0 <= result['recall'] <= 1
+            assert result['p99'] >= result['p50']
+            assert result['index_size'] > 0
@@ -2,11 +2,18 @@ import os
 import django
 from django.conf import settings
 from django.core import serializers
-from django.db import connection, migrations, models
+from django.db import connection, migrations, models, transaction
 from django.contrib.postgres.fields import ArrayField
 from django.db.migrations.loader import MigrationLoader
+from pgvector.utils import to_db_bits, unpack_bits
 import numpy as np
-from lantern_django import LanternExtension, LanternExtrasExtension, HnswIndex, L2Distance, CosineDistance, RealField, TextEmbedding
+import asyncio
+from asgiref.sync import sync_to_async
+from lantern_django import LanternExtension, LanternExtrasExtension, HnswIndex, L2Distance, CosineDistance, HammingDistance, RealField, TextEmbedding, BitVectorField, columnar, to_db_batch
+from lantern_django.aio import acolumnar, aembeddings, get_pool
+from lantern_django.cache import cached
+from lantern_django.maintenance import hnsw_indexes, maintain_index
+from lantern_django.routing import VectorManager
 from unittest import mock
 
 settings.configure(
@@ -18,6 +25,13 @@ settings.configure(
             'PASSWORD': os.environ.get('DB_PASSWORD', 'postgres'),
             'HOST': os.environ.get('DB_HOST', 'localhost'),
             'PORT': os.environ.get('DB_PORT', '5432'),
+        },
+        # nothing listens here
+        'broken_replica': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'postgres'),
+            'HOST': 'localhost',
+            'PORT': '1',
         }
     }
 )
@@ -27,6 +41,8 @@ django.setup()
 class Item(models.Model):
     embedding = ArrayField(RealField(), size=384, null=True)
 
+    objects = VectorManager()
+
     class Meta:
         app_label = 'myapp'
         indexes = [
@@ -42,6 +58,13 @@ class Item(models.Model):
         ]
 
 
+class BitItem(models.Model):
+    bits = BitVectorField(dimensions=64, null=True)
+
+    class Meta:
+        app_label = 'myapp'
+
+
 class Migration(migrations.Migration):
     initial = True
 
@@ -59,6 +82,14 @@ class Migration(migrations.Migration):
                 ('embedding', ArrayField(RealField(), size=384, null=True)),
             ],
         ),
+        migrations.CreateModel(
+            name='BitItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True,
+                 primary_key=True, serialize=False, verbose_name='ID')),
+                ('bits', BitVectorField(dimensions=64, null=True)),
+            ],
+        ),
         migrations.AddIndex(
             model_name='item',
             index=HnswIndex(
@@ -81,6 +112,7 @@ sql_statements = loader.collect_sql([(migration, False)])
 
 with connection.cursor() as cursor:
     cursor.execute("DROP TABLE IF EXISTS myapp_item")
+    cursor.execute("DROP TABLE IF EXISTS myapp_bititem")
     cursor.execute('\n'.join(sql_statements))
 
 
@@ -123,12 +155,94 @@ class TestDjango:
         # TODO: Remove this and uncomment above when double precision supported
         assert [v.distance for v in items] == [0, 0, 0.057191014]
 
+    def test_columnar(self):
+        create_items()
+        distance = L2Distance('embedding', [1, 1, 1] + [0] * 381)
+        result = columnar(Item.objects.order_by(distance), distance, 'embedding', dim=384)
+        assert result.ids.tolist() == [1, 3, 2]
+        assert result.distances.tolist() == [0, 1, 3]
+        assert result.embeddings.shape == (3, 384)
+        assert result.embeddings.dtype == np.float32
+
+    async def test_acolumnar(self):
+        await sync_to_async(create_items)()
+        distance = L2Distance('embedding', [1, 1, 1] + [0] * 381)
+        queryset = Item.objects.order_by(distance)
+        results = await asyncio.gather(*[acolumnar(queryset, distance, 'embedding', dim=384) for _ in range(5)])
+        for result in results:
+            assert result.ids.tolist() == [1, 3, 2]
+            assert result.distances.tolist() == [0, 1, 3]
+            assert result.embeddings.dtype == np.float32
+            assert result.embeddings[2, :3].tolist() == [2, 2, 2]
+
+        ids, embeddings = await aembeddings(Item.objects.order_by('id'), 'embedding', dim=384)
+        assert ids.tolist() == [1, 2, 3]
+        assert embeddings.shape == (3, 384)
+        await get_pool().close()
+
+    async def test_acolumnar_empty(self):
+        result = await acolumnar(Item.objects.filter(pk__in=[]), L2Distance('embedding', [1] * 384), 'embedding', dim=384)
+        assert len(result) == 0
+        assert result.embeddings.shape == (0, 384)
+
+    async def test_acolumnar_replica_fallback(self):
+        await sync_to_async(create_items)()
+        distance = L2Distance('embedding', [1, 1, 1] + [0] * 381)
+        with mock.patch('lantern_django.aio.get_selector') as get_selector:
+            get_selector.return_value.due.return_value = False
+            get_selector.return_value.choose.return_value = 'broken_replica'
+            result = await acolumnar(Item.objects.order_by(distance), distance)
+            assert result.ids.tolist() == [1, 3, 2]
+            get_selector.return_value.choose.assert_called_with(check=False)
+            get_selector.return_value.mark_failed.assert_called_with('broken_replica')
+        await get_pool().close()
+
     def test_filter(self):
         create_items()
         distance = L2Distance('embedding', [1, 1, 1] + [0] * 381)
         items = Item.objects.alias(distance=distance).filter(distance__lt=1)
         assert [v.id for v in items] == [1]
 
+    def test_routing(self):
+        create_items()
+        distance = L2Distance('embedding', [1, 1, 1] + [0] * 381)
+        with mock.patch('lantern_django.routing.get_selector') as get_selector:
+            get_selector.return_value.choose.return_value = 'default'
+            items = Item.objects.order_by(distance)
+            assert [v.id for v in items] == [1, 3, 2]
+            get_selector.return_value.choose.assert_called()
+
+    def test_routing_fallback(self):
+        create_items()
+        distance = L2Distance('embedding', [1, 1, 1] + [0] * 381)
+        with mock.patch('lantern_django.routing.get_selector') as get_selector:
+            get_selector.return_value.choose.return_value = 'broken_replica'
+            items = Item.objects.order_by(distance)
+            assert [v.id for v in items] == [1, 3, 2]
+            get_selector.return_value.mark_failed.assert_called_with('broken_replica')
+            assert items.count() == 3
+            assert items.exists()
+            assert [v.id for v in items.iterator()] == [1, 3, 2]
+            assert get_selector.return_value.mark_failed.call_count == 4
+
+    def test_cached(self):
+        create_items()
+        distance = L2Distance('embedding', [1, 1, 1] + [0] * 381)
+        items = Item.objects.order_by(distance)[:2]
+        assert [v.id for v in cached(items)] == [1, 3]
+        Item(id=4, embedding=[1, 1, 1.5] + [0] * 381).save()
+        assert [v.id for v in cached(items)] == [1, 4]
+
+    def test_cached_rollback(self):
+        create_items()
+        distance = L2Distance('embedding', [1, 1, 1] + [0] * 381)
+        items = Item.objects.order_by(distance)[:2]
+        with transaction.atomic():
+            Item(id=4, embedding=[1, 1, 1.5] + [0] * 381).save()
+            assert [v.id for v in cached(items)] == [1, 4]
+            transaction.set_rollback(True)
+        assert [v.id for v in cached(items)] == [1, 3]
+
     def test_text_embedding(self):
         create_items()
         distance = L2Distance('embedding', TextEmbedding(
@@ -161,6 +275,35 @@ class TestDjango:
     def test_get_or_create(self):
         Item.objects.get_or_create(embedding=[1, 2, 3] + [0] * 381)
 
+    def test_bulk_create(self):
+        embeddings = to_db_batch(np.random.rand(3, 384) + 1, dim=384, normalize=True)
+        Item.objects.bulk_create([Item(embedding=v) for v in embeddings])
+        items = Item.objects.all()
+        assert np.allclose([np.linalg.norm(v.embedding) for v in items], 1)
+
+    def test_bit_vector(self):
+        BitItem.objects.all().delete()
+        bits = np.zeros((3, 64), dtype=np.uint8)
+        bits[1, :2] = 1
+        bits[2, :5] = 1
+        BitItem.objects.bulk_create([BitItem(id=i + 1, bits=v) for i, v in enumerate(bits)])
+        assert np.array_equal(unpack_bits(BitItem.objects.get(pk=2).bits, 64), bits[1])
+
+        distance = HammingDistance('bits', to_db_bits(bits[0]))
+        items = BitItem.objects.annotate(distance=distance).order_by(distance)
+        assert [v.id for v in items] == [1, 2, 3]
+        assert [v.distance for v in items] == [0, 2, 5]
+
+    def test_maintain_index(self):
+        create_items()
+        model, index = list(hnsw_indexes([Item, BitItem]))[0]
+        assert model is Item
+        with connection.cursor() as cursor:
+            report = maintain_index(cursor, model, index, k=3, samples=3, dry_run=True)
+        assert report['table'] == 'myapp_item'
+        assert report['recall'] == 1.0
+        assert not report['reindexed']
+
     def test_missing(self):
         Item().save()
         assert Item.objects.first().embedding is None
@@ -0,0 +1,63 @@
+import numpy as np
+from pgvector.maintenance import index_stats, maintain, sampled_recall
+import psycopg2
+import pytest
+import time
+
+conn = psycopg2.connect(
+    dbname='postgres',
+    user='postgres',
+    password='postgres',
+    host='localhost',
+    port='5432'
+)
+conn.autocommit = True
+
+cur = conn.cursor()
+cur.execute('CREATE EXTENSION IF NOT EXISTS lantern')
+cur.execute('DROP TABLE IF EXISTS maintenance_items')
+cur.execute('CREATE TABLE maintenance_items (id bigserial PRIMARY KEY, embedding real[])')
+cur.execute('CREATE INDEX maintenance_idx ON maintenance_items USING hnsw (embedding dist_l2sq_ops) WITH (dim=3)')
+
+
+class TestMaintenance:
+    def setup_method(self, test_method):
+        cur.execute('TRUNCATE maintenance_items')
+        for v in np.random.rand(50, 3).tolist():
+            cur.execute('INSERT INTO maintenance_items (embedding) VALUES (%s)', (v,))
+        cur.execute('ANALYZE maintenance_items')
+
+    def test_index_stats(self):
+        stats = index_stats(cur, 'maintenance_idx')
+        assert stats['table'] == 'maintenance_items'
+        assert stats['size'] > 0
+        assert stats['dead_ratio'] >= 0
+
+    def test_sampled_recall(self):
+        assert sampled_recall(cur, 'maintenance_items', 'embedding', 'dist_l2sq_ops', k=5, samples=10) > 0.8
+
+    def test_maintain(self):
+        report = maintain(cur, 'maintenance_idx', 'embedding', 'dist_l2sq_ops', min_recall=1.1, dry_run=True)
+        assert report['reasons']
+        assert not report['reindexed']
+
+        report = maintain(cur, 'maintenance_idx', 'embedding', 'dist_l2sq_ops', min_recall=1.1)
+        assert report['reindexed']
+
+    def test_maintain_dead_tuples(self):
+        cur.execute('DELETE FROM maintenance_items WHERE id % 2 = 0')
+        # table statistics are flushed when the session has been idle
+        time.sleep(2)
+
+        report = maintain(cur, 'maintenance_idx', 'embedding', 'dist_l2sq_ops', min_recall=0, max_dead_ratio=0.2)
+        assert report['vacuumed']
+        assert report['reindexed']
+
+        # the next run does not rebuild it again
+        report = maintain(cur, 'maintenance_idx', 'embedding', 'dist_l2sq_ops', min_recall=0, max_dead_ratio=0.2)
+        assert report['reasons'] == []
+        assert not report['reindexed']
+
+    def test_missing_index(self):
+        with pytest.raises(ValueError, match='index not found: missing_idx'):
+            index_stats(cur, 'missing_idx')
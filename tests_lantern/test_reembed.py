@@ -0,0 +1,90 @@
+import numpy as np
+from pgvector.reembed import ReembedJob
+import psycopg2
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+
+
+def connect():
+    return psycopg2.connect(
+        dbname='postgres',
+        user='postgres',
+        password='postgres',
+        host='localhost',
+        port='5432'
+    )
+
+
+conn = connect()
+conn.autocommit = True
+
+cur = conn.cursor()
+cur.execute('CREATE EXTENSION IF NOT EXISTS lantern')
+cur.execute('CREATE EXTENSION IF NOT EXISTS lantern_extras')
+cur.execute('DROP TABLE IF EXISTS reembed_items')
+cur.execute('CREATE TABLE reembed_items (id bigserial PRIMARY KEY, body text, embedding real[], body_hash text)')
+
+
+def embed(texts):
+    return np.array([[len(t), 1, 0] for t in texts])
+
+
+class TestReembed:
+    def setup_method(self, test_method):
+        cur.execute('TRUNCATE reembed_items RESTART IDENTITY')
+        cur.execute("INSERT INTO reembed_items (body) SELECT 'item ' || i FROM generate_series(1, 25) i")
+
+    def test_client(self, tmp_path):
+        progress = []
+        job = ReembedJob(connect, 'reembed_items', 'body', 'embedding', 'body_hash', 'test-model', embed=embed,
+                         batch_size=10, workers=2, checkpoint=str(tmp_path / 'checkpoint.json'), progress=progress.append)
+        stats = job.run()
+        assert stats['rows'] == 25
+        assert [v['rows'] for v in progress] == [10, 20, 25]
+
+        cur.execute('SELECT embedding FROM reembed_items WHERE id = 1')
+        assert np.array_equal(cur.fetchone()[0], [6, 1, 0])
+
+        # nothing changed
+        job = ReembedJob(connect, 'reembed_items', 'body', 'embedding', 'body_hash', 'test-model', embed=embed)
+        assert job.run()['rows'] == 0
+
+        cur.execute("UPDATE reembed_items SET body = 'changed' WHERE id = 1")
+        assert job.run()['rows'] == 1
+
+    def test_checkpoint_rerun(self, tmp_path):
+        checkpoint = str(tmp_path / 'checkpoint.json')
+        job = ReembedJob(connect, 'reembed_items', 'body', 'embedding', 'body_hash', 'test-model', embed=embed,
+                         batch_size=10, checkpoint=checkpoint)
+        assert job.run()['rows'] == 25
+
+        # rows below the last pk of the finished run are still picked up
+        cur.execute("UPDATE reembed_items SET body = 'changed' WHERE id = 1")
+        stats = job.run()
+        assert stats['rows'] == 1
+        assert stats['last_pk'] == 1
+
+    def test_no_idle_transaction(self):
+        connections = []
+        statuses = []
+
+        def connect_and_record():
+            connections.append(connect())
+            return connections[-1]
+
+        def progress(stats):
+            # the first connection reads the batches
+            statuses.append(connections[0].get_transaction_status())
+
+        job = ReembedJob(connect_and_record, 'reembed_items', 'body', 'embedding', 'body_hash', 'test-model', embed=embed,
+                         batch_size=10, progress=progress, release=lambda conn: None)
+        job.run()
+        assert statuses == [TRANSACTION_STATUS_IDLE] * 3
+        for conn2 in connections:
+            conn2.close()
+
+    def test_server(self):
+        job = ReembedJob(connect, 'reembed_items', 'body', 'embedding', 'body_hash', 'BAAI/bge-small-en', batch_size=10)
+        assert job.run()['rows'] == 25
+
+        cur.execute('SELECT array_length(embedding, 1) FROM reembed_items WHERE id = 1')
+        assert cur.fetchone()[0] == 384
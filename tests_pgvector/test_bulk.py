@@ -0,0 +1,62 @@
+import os
+import numpy as np
+from pgvector.bulk import copy_vectors
+from pgvector.psycopg2 import register_vector
+import psycopg
+import psycopg2
+import pytest
+
+conn = psycopg2.connect(dbname='pgvector_python_test')
+conn.autocommit = True
+
+cur = conn.cursor()
+cur.execute('CREATE EXTENSION IF NOT EXISTS vector')
+cur.execute('DROP TABLE IF EXISTS bulk_items')
+cur.execute('CREATE TABLE bulk_items (id bigint PRIMARY KEY, embedding vector(3), array_embedding real[])')
+
+register_vector(cur)
+
+
+def fetch(column):
+    cur.execute('SELECT id, %s FROM bulk_items ORDER BY id' % column)
+    rows = cur.fetchall()
+    return [v[0] for v in rows], np.array([v[1] for v in rows], dtype=np.float32)
+
+
+class TestBulk:
+    def setup_method(self, test_method):
+        cur.execute('DELETE FROM bulk_items')
+
+    def test_psycopg2(self):
+        embeddings = np.random.rand(100, 3).astype(np.float32)
+        copy_vectors(cur, 'bulk_items', embeddings, ids=np.arange(100), chunk_size=30)
+        ids, values = fetch('embedding')
+        assert ids == list(range(100))
+        assert np.array_equal(values, embeddings)
+
+    def test_psycopg(self):
+        embeddings = np.random.rand(100, 3).astype(np.float32)
+        with psycopg.connect(dbname='pgvector_python_test', autocommit=True) as conn3:
+            copy_vectors(conn3.cursor(), 'bulk_items', embeddings, column='array_embedding', ids=np.arange(100), format='real[]')
+        ids, values = fetch('array_embedding')
+        assert ids == list(range(100))
+        assert np.array_equal(values, embeddings)
+
+    def test_processes(self, tmp_path):
+        path = str(tmp_path / 'embeddings.f4')
+        embeddings = np.memmap(path, dtype=np.float32, mode='w+', shape=(1000, 3))
+        embeddings[:] = np.random.rand(1000, 3)
+        embeddings.flush()
+
+        copy_vectors(cur, 'bulk_items', np.memmap(path, dtype=np.float32, mode='r', shape=(1000, 3)),
+                     ids=np.arange(1000), processes=2, chunk_size=100)
+        ids, values = fetch('embedding')
+        assert ids == list(range(1000))
+        assert np.array_equal(values, embeddings)
+
+    def test_processes_error(self):
+        before = set(os.listdir('/dev/shm'))
+        with pytest.raises(psycopg2.errors.UndefinedColumn):
+            copy_vectors(cur, 'bulk_items', np.random.rand(1000, 3).astype(np.float32), column='missing',
+                         ids=np.arange(1000), processes=2, chunk_size=100)
+        assert set(os.listdir('/dev/shm')) <= before
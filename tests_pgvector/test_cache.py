@@ -0,0 +1,52 @@
+import numpy as np
+from pgvector.cache import ResultCache, invalidate, written_table
+
+
+class TestCache:
+    def test_key(self):
+        cache = ResultCache()
+        key = cache.key('SELECT 1', (np.array([1, 2, 3]), 5))
+        assert key == cache.key('SELECT 1', (np.array([1, 2, 3]), 5))
+        assert key != cache.key('SELECT 1', (np.array([1, 2, 4]), 5))
+        assert key != cache.key('SELECT 1', (np.array([1, 2, 3]), 6))
+
+    def test_get_set(self):
+        cache = ResultCache()
+        cache.set('key', cache.versions(['cache_items']), [(1, 0.5)])
+        assert cache.get('key') == [(1, 0.5)]
+        assert cache.get('missing') is None
+
+    def test_invalidate(self):
+        cache = ResultCache()
+        cache.set('key', cache.versions(['cache_items']), [(1, 0.5)])
+        invalidate('cache_items')
+        assert cache.get('key') is None
+        assert len(cache) == 0
+
+    def test_invalidate_during_query(self):
+        cache = ResultCache()
+        versions = cache.versions(['cache_items'])
+        # a write commits while the query runs
+        invalidate('cache_items')
+        cache.set('key', versions, [(1, 0.5)])
+        assert cache.get('key') is None
+
+    def test_ttl(self):
+        cache = ResultCache(ttl=-1)
+        cache.set('key', (), [(1, 0.5)])
+        assert cache.get('key') is None
+
+    def test_lru(self):
+        cache = ResultCache(max_bytes=1000)
+        for i in range(20):
+            cache.set(i, (), [i] * 10)
+        assert cache.nbytes <= 1000
+        assert cache.get(19) == [19] * 10
+        assert cache.get(0) is None
+
+    def test_written_table(self):
+        assert written_table('INSERT INTO "myapp_item" ("embedding") VALUES (%s)') == 'myapp_item'
+        assert written_table('UPDATE public.items SET embedding = %s') == 'items'
+        assert written_table('DELETE FROM items') == 'items'
+        assert written_table('TRUNCATE TABLE items') == 'items'
+        assert written_table('SELECT * FROM items') is None
@@ -0,0 +1,58 @@
+import numpy as np
+from pgvector.centroids import CentroidAccumulator, assign, grouped_centroids, kmeans
+from pgvector.psycopg2 import register_vector
+import psycopg2
+
+conn = psycopg2.connect(dbname='pgvector_python_test')
+conn.autocommit = True
+
+cur = conn.cursor()
+cur.execute('CREATE EXTENSION IF NOT EXISTS vector')
+cur.execute('DROP TABLE IF EXISTS centroid_items')
+cur.execute('CREATE TABLE centroid_items (id bigserial PRIMARY KEY, category text, embedding vector(3))')
+cur.execute("INSERT INTO centroid_items (category, embedding) VALUES ('a', '[1,1,1]'), ('b', '[2,2,2]'), ('a', '[1,1,2]')")
+
+
+class TestCentroids:
+    def test_accumulator(self):
+        accumulator = CentroidAccumulator(2)
+        accumulator.add(['a', 'b'], np.array([[1, 1], [2, 2]]))
+        accumulator.add(['a'], np.array([[3, 3]]))
+        labels, centroids = accumulator.centroids()
+        assert labels == ['a', 'b']
+        assert np.array_equal(centroids, [[2, 2], [2, 2]])
+        assert centroids.dtype == np.float32
+
+    def test_grouped_centroids(self):
+        cur.execute('SELECT category, embedding FROM centroid_items')
+        labels, centroids = grouped_centroids(cur, 3, chunk_size=2)
+        assert dict(zip(labels, centroids.tolist())) == {'a': [1, 1, 1.5], 'b': [2, 2, 2]}
+
+    def test_grouped_centroids_named(self):
+        with conn.cursor(name='centroids', withhold=True) as cur2:
+            cur2.execute('SELECT category, embedding FROM centroid_items')
+            labels, centroids = grouped_centroids(cur2, 3, chunk_size=2)
+        assert dict(zip(labels, centroids.tolist())) == {'a': [1, 1, 1.5], 'b': [2, 2, 2]}
+
+    def test_grouped_centroids_registered(self):
+        cur2 = conn.cursor()
+        register_vector(cur2)
+        cur2.execute('SELECT category, embedding FROM centroid_items')
+        labels, centroids = grouped_centroids(cur2, 3)
+        assert dict(zip(labels, centroids.tolist())) == {'a': [1, 1, 1.5], 'b': [2, 2, 2]}
+
+    def test_grouped_centroids_null(self):
+        cur.execute("SELECT category, embedding FROM centroid_items UNION ALL SELECT 'a', NULL")
+        labels, centroids = grouped_centroids(cur, 3)
+        assert dict(zip(labels, centroids.tolist())) == {'a': [1, 1, 1.5], 'b': [2, 2, 2]}
+
+    def test_assign(self):
+        labels = assign(np.array([[0, 0], [5, 5], [1, 0]]), np.array([[0, 0], [5, 5]]), chunk_size=2)
+        assert labels.tolist() == [0, 1, 0]
+
+    def test_kmeans(self):
+        rng = np.random.default_rng(0)
+        vectors = np.vstack([rng.normal(c, 0.1, (100, 2)) for c in [0, 10]])
+        rng.shuffle(vectors)
+        centroids = kmeans(lambda: np.array_split(vectors, 4), 2, seed=1)
+        assert np.allclose(sorted(centroids[:, 0]), [0, 10], atol=0.5)
@@ -0,0 +1,117 @@
+import numpy as np
+from pgvector.instrumentation import CallbackRecorder, OpenTelemetryRecorder, get_recorder, observe_query, query_labels, set_recorder, clock
+from pgvector.peewee import instrument as instrument_peewee
+from pgvector.psycopg2 import InstrumentedCursor
+from pgvector.utils import from_db, from_db_batch, get_codec, to_db, to_db_binary
+
+KNN_SQL = 'SELECT id FROM items ORDER BY embedding <-> %s LIMIT 5'
+
+
+class Instrument(object):
+    def __init__(self):
+        self.values = []
+
+    def add(self, value, attributes):
+        self.values.append((value, attributes))
+
+    record = add
+
+
+class Meter(object):
+    def __init__(self):
+        self.instruments = {}
+
+    def create_counter(self, name):
+        return self.instruments.setdefault(name, Instrument())
+
+    def create_histogram(self, name, unit=None):
+        return self.instruments.setdefault(name, Instrument())
+
+
+class TestInstrumentation:
+    def setup_method(self, test_method):
+        self.events = []
+        set_recorder(CallbackRecorder(lambda *event: self.events.append(event)))
+
+    def teardown_method(self, test_method):
+        set_recorder(None)
+
+    def counters(self):
+        return [(name, value, attributes) for kind, name, value, attributes in self.events if kind == 'counter']
+
+    def test_encode(self):
+        to_db([1, 2, 3])
+        assert self.counters() == [
+            ('pgvector.vectors.encoded', 1, {'format': 'text'}),
+            ('pgvector.bytes.encoded', 13, {'format': 'text'})
+        ]
+        assert self.events[2][:2] == ('histogram', 'pgvector.codec.duration')
+        assert self.events[2][3] == {'operation': 'encoded', 'format': 'text'}
+
+    def test_decode_batch(self):
+        from_db_batch(['[1,2,3]', '[4,5,6]'])
+        assert self.counters() == [
+            ('pgvector.vectors.decoded', 2, {'format': 'text'}),
+            ('pgvector.bytes.decoded', 14, {'format': 'text'})
+        ]
+
+    def test_decode_batch_decoded(self):
+        # already decoded by the driver
+        from_db_batch([np.array([1, 2, 3]), np.array([4, 5, 6])])
+        assert self.counters() == []
+
+    def test_codec(self):
+        codec = get_codec(3)
+        codec.from_db_binary(codec.to_db_binary(np.array([1, 2, 3])))
+        assert self.counters() == [
+            ('pgvector.vectors.encoded', 1, {'format': 'binary'}),
+            ('pgvector.bytes.encoded', 16, {'format': 'binary'}),
+            ('pgvector.vectors.decoded', 1, {'format': 'binary'}),
+            ('pgvector.bytes.decoded', 16, {'format': 'binary'})
+        ]
+
+    def test_query_labels(self):
+        assert query_labels('SELECT id FROM items ORDER BY embedding <=> %s LIMIT 5') == ('cosine', 5)
+        assert query_labels(b'SELECT id FROM items ORDER BY embedding <-> %s LIMIT %s') == ('l2', None)
+        assert query_labels('SELECT embedding <-> %s FROM items') is None
+
+    def test_observe_query(self):
+        observe_query('SELECT id FROM items ORDER BY embedding <+> %s LIMIT 10', clock())
+        observe_query('SELECT 1', clock())
+        assert self.counters() == [('pgvector.queries', 1, {'metric': 'hamming', 'k': 10})]
+
+    def test_peewee_instrument_twice(self):
+        class Database(object):
+            def execute_sql(self, sql, params=None):
+                return None
+
+        db = Database()
+        instrument_peewee(db)
+        instrument_peewee(db)
+        db.execute_sql(KNN_SQL)
+        assert self.counters() == [('pgvector.queries', 1, {'metric': 'l2', 'k': 5})]
+
+    def test_psycopg2_executemany(self):
+        class Cursor(object):
+            def executemany(self, query, vars_list):
+                return None
+
+        cur = type('InstrumentedCursor', (InstrumentedCursor, Cursor), {})()
+        cur.executemany(KNN_SQL, [('[1,2,3]',), ('[4,5,6]',)])
+        assert self.counters() == [('pgvector.queries', 1, {'metric': 'l2', 'k': 5})]
+
+    def test_open_telemetry(self):
+        meter = Meter()
+        set_recorder(OpenTelemetryRecorder(meter))
+        to_db_binary([1, 2, 3])
+        to_db_binary([1, 2])
+        assert meter.instruments['pgvector.vectors.encoded'].values == [(1, {'format': 'binary'})] * 2
+        assert meter.instruments['pgvector.bytes.encoded'].values == [(16, {'format': 'binary'}), (12, {'format': 'binary'})]
+        assert len(meter.instruments['pgvector.codec.duration'].values) == 2
+
+    def test_disabled(self):
+        set_recorder(None)
+        assert get_recorder() is None
+        assert clock() is None
+        from_db('[1,2,3]')
+        assert self.events == []
@@ -1,7 +1,8 @@
 from math import sqrt
 import numpy as np
+from pgvector.utils import unpack_bits
 from peewee import Model, PostgresqlDatabase, fn
-from pgvector.peewee import VectorField
+from pgvector.peewee import BitVectorField, VectorField, columnar
 
 db = PostgresqlDatabase('pgvector_python_test')
 
@@ -15,12 +16,16 @@ class Item(BaseModel):
     embedding = VectorField(dimensions=3)
 
 
+class BitItem(BaseModel):
+    bits = BitVectorField(dimensions=40, null=True)
+
+
 Item.add_index('embedding vector_l2_ops', using='hnsw')
 
 db.connect()
 db.execute_sql('CREATE EXTENSION IF NOT EXISTS vector')
-db.drop_tables([Item])
-db.create_tables([Item])
+db.drop_tables([Item, BitItem])
+db.create_tables([Item, BitItem])
 
 
 def create_items():
@@ -64,6 +69,15 @@ class TestPeewee:
         assert [v.id for v in items] == [1, 2, 3]
         assert [v.distance for v in items] == [0, 0, 0.05719095841793653]
 
+    def test_columnar(self):
+        create_items()
+        distance = Item.embedding.l2_distance([1, 1, 1])
+        result = columnar(Item.select(Item.id, distance, Item.embedding).order_by(distance), dim=3)
+        assert result.ids.tolist() == [1, 3, 2]
+        assert result.distances.tolist() == [0, 1, sqrt(3)]
+        assert result.embeddings.dtype == np.float32
+        assert np.array_equal(result.embeddings, [[1, 1, 1], [1, 1, 2], [2, 2, 2]])
+
     def test_where(self):
         create_items()
         items = Item.select().where(Item.embedding.l2_distance([1, 1, 1]) < 1)
@@ -89,3 +103,10 @@ class TestPeewee:
         Item.get_or_create(id=1, defaults={'embedding': [1, 2, 3]})
         Item.get_or_create(embedding=np.array([4, 5, 6]))
         Item.get_or_create(embedding=Item.embedding.to_value([7, 8, 9]))
+
+    def test_bit_vector(self):
+        bits = np.random.randint(0, 2, 40)
+        BitItem.create(id=1, bits=bits)
+        item = BitItem.get_by_id(1)
+        assert item.bits.dtype == np.int32
+        assert np.array_equal(unpack_bits(item.bits, 40), bits)
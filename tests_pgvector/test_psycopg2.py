@@ -1,6 +1,8 @@
 import numpy as np
-from pgvector.psycopg2 import register_vector
+from pgvector.psycopg2 import adapt_batch, register_vector
 import psycopg2
+from psycopg2.extras import execute_batch, execute_values
+import pytest
 
 conn = psycopg2.connect(dbname='pgvector_python_test')
 conn.autocommit = True
@@ -25,4 +27,27 @@ class TestPsycopg2:
         res = cur.fetchall()
         assert np.array_equal(res[0][1], embedding)
         assert res[0][1].dtype == np.float32
-        assert res[1][1] is None
\ No newline at end of file
+        assert res[1][1] is None
+
+    def test_execute_values(self):
+        embeddings = np.array([[1.5, 2, 3], [4, 5, 6]])
+        execute_values(cur, 'INSERT INTO items (embedding) VALUES %s', [(v,) for v in adapt_batch(embeddings, dim=3)])
+
+        cur.execute('SELECT embedding FROM items ORDER BY id')
+        assert np.array_equal(np.stack([v[0] for v in cur.fetchall()]), embeddings)
+
+    def test_connection(self):
+        conn2 = psycopg2.connect(dbname='pgvector_python_test')
+        conn2.autocommit = True
+        register_vector(conn2, globally=False, dim=3)
+        cur2 = conn2.cursor()
+
+        embedding = np.array([1.5, 2, 3])
+        execute_batch(cur2, 'INSERT INTO items (embedding) VALUES (%s)', [(embedding,), (embedding,)])
+        cur2.execute('SELECT embedding FROM items WHERE embedding = %(embedding)s', {'embedding': embedding})
+        res = cur2.fetchall()
+        assert len(res) == 2
+        assert res[0][0].dtype == np.float32
+
+        with pytest.raises(ValueError, match='expected 3 dimensions, not 2'):
+            cur2.execute('SELECT %s', (np.array([1, 2]),))
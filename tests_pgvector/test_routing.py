@@ -0,0 +1,44 @@
+from threading import Event, Thread
+from pgvector.routing import ReplicaSelector
+
+
+class TestRouting:
+    def test_round_robin(self):
+        selector = ReplicaSelector(['a', 'b'])
+        assert [selector.choose() for _ in range(4)] == ['a', 'b', 'a', 'b']
+
+    def test_max_lag(self):
+        lags = {'a': 10, 'b': 1}
+        selector = ReplicaSelector(['a', 'b'], lag=lags.get, max_lag=5)
+        assert [selector.choose() for _ in range(2)] == ['b', 'b']
+
+    def test_fallback(self):
+        def lag(replica):
+            raise ConnectionError()
+
+        selector = ReplicaSelector(['a'], lag=lag)
+        assert selector.choose() is None
+
+    def test_mark_failed(self):
+        selector = ReplicaSelector(['a', 'b'], lag=lambda replica: 0, check_interval=60)
+        assert selector.healthy() == ['a', 'b']
+        selector.mark_failed('a')
+        assert [selector.choose() for _ in range(2)] == ['b', 'b']
+
+    def test_probe_outside_lock(self):
+        probing = Event()
+        release = Event()
+
+        def lag(replica):
+            probing.set()
+            release.wait(5)
+            return 0
+
+        selector = ReplicaSelector(['a'], lag=lag, check_interval=60)
+        thread = Thread(target=selector.healthy)
+        thread.start()
+        probing.wait(5)
+        # the last known list is returned while another thread probes
+        assert selector.healthy() == ['a']
+        release.set()
+        thread.join()
@@ -0,0 +1,94 @@
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+import time
+from pgvector.sharding import Shard, ShardedSearch
+import psycopg2
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+from psycopg2.pool import ThreadedConnectionPool
+import pytest
+
+conn = psycopg2.connect(dbname='pgvector_python_test')
+conn.autocommit = True
+
+cur = conn.cursor()
+cur.execute('CREATE EXTENSION IF NOT EXISTS vector')
+for table in ['shard_items_0', 'shard_items_1']:
+    cur.execute('DROP TABLE IF EXISTS %s' % table)
+    cur.execute('CREATE TABLE %s (id bigserial PRIMARY KEY, embedding vector(3))' % table)
+cur.execute("INSERT INTO shard_items_0 (id, embedding) VALUES (1, '[1,1,1]'), (2, '[2,2,2]')")
+cur.execute("INSERT INTO shard_items_1 (id, embedding) VALUES (3, '[1,1,2]'), (4, '[3,3,3]')")
+
+
+def slow_shard(vector, k):
+    time.sleep(1)
+    return []
+
+
+class TestSharding:
+    def test_search(self):
+        search = ShardedSearch({
+            'a': Shard(psycopg2.connect(dbname='pgvector_python_test'), 'shard_items_0', cast='vector'),
+            'b': Shard(psycopg2.connect(dbname='pgvector_python_test'), 'shard_items_1', cast='vector')
+        })
+        result = search.search([1, 1, 1], 3)
+        assert [v.row[0] for v in result.hits] == [1, 3, 2]
+        assert [v.shard for v in result.hits] == ['a', 'b', 'a']
+        assert result.failed == {}
+        search.close()
+
+    def test_transaction_ended(self):
+        conn2 = psycopg2.connect(dbname='pgvector_python_test')
+        search = ShardedSearch({'a': Shard(conn2, 'shard_items_0', cast='vector')})
+        search.search([1, 1, 1], 3)
+        # not left idle in transaction, holding a lock on the partition
+        assert conn2.get_transaction_status() == TRANSACTION_STATUS_IDLE
+        search.close()
+
+    def test_timeout(self):
+        search = ShardedSearch({
+            'a': Shard(psycopg2.connect(dbname='pgvector_python_test'), 'shard_items_0', cast='vector'),
+            'slow': slow_shard
+        }, timeout=0.5)
+        result = search.search([1, 1, 1], 3)
+        assert [v.row[0] for v in result.hits] == [1, 2]
+        assert list(result.failed) == ['slow']
+        search.close()
+
+    def test_timeout_cancels(self):
+        shard = Shard(psycopg2.connect(dbname='pgvector_python_test'), 'shard_items_0', cast='vector')
+        sql = shard.sql
+        shard.sql = 'SELECT 0, id FROM shard_items_0, pg_sleep(5) WHERE %s::text IS NOT NULL LIMIT %s'
+        search = ShardedSearch({'a': shard}, timeout=0.5)
+        assert list(search.search([1, 1, 1], 3).failed) == ['a']
+
+        # the worker and connection are free again instead of waiting on the slow query
+        shard.sql = sql
+        result = search.search([1, 1, 1], 3)
+        assert result.failed == {}
+        assert [v.row[0] for v in result.hits] == [1, 2]
+        search.close()
+
+    def test_timeout_not_partial(self):
+        search = ShardedSearch({'slow': slow_shard}, timeout=0.5, partial=False)
+        with pytest.raises(TimeoutError):
+            search.search([1, 1, 1], 3)
+        search.close()
+
+    def test_concurrent_timeout(self):
+        pool = ThreadedConnectionPool(1, 4, dbname='pgvector_python_test')
+        shard = Shard(pool, 'shard_items_0', cast='vector')
+        shard.sql = "SELECT 0, id FROM shard_items_0, pg_sleep(CASE WHEN %s::text = '{9}' THEN 5 ELSE 1 END) LIMIT %s"
+        slow = ShardedSearch({'a': shard}, timeout=0.5)
+        fast = ShardedSearch({'a': shard}, timeout=5)
+
+        with ThreadPoolExecutor(1) as executor:
+            future = executor.submit(fast.search, [1], 3)
+            time.sleep(0.1)
+            assert list(slow.search([9], 3).failed) == ['a']
+            # the timeout only cancelled its own query
+            result = future.result()
+            assert result.failed == {}
+            assert [v.row[0] for v in result.hits] == [1, 2]
+
+        slow.close()
+        fast.close()
+        pool.closeall()
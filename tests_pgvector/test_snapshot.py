@@ -0,0 +1,101 @@
+from datetime import timedelta
+import os
+import numpy as np
+from pgvector.psycopg2 import register_vector
+from pgvector.snapshot import Snapshot
+import psycopg2
+import pytest
+
+conn = psycopg2.connect(dbname='pgvector_python_test')
+conn.autocommit = True
+
+cur = conn.cursor()
+cur.execute('CREATE EXTENSION IF NOT EXISTS vector')
+cur.execute('DROP TABLE IF EXISTS snapshot_items')
+cur.execute('CREATE TABLE snapshot_items (id bigserial PRIMARY KEY, embedding vector(3), updated_at timestamptz DEFAULT now())')
+
+register_vector(cur)
+
+
+class TestSnapshot:
+    def setup_method(self, test_method):
+        cur.execute('DELETE FROM snapshot_items')
+
+    def test_key(self, tmp_path):
+        cur.execute("INSERT INTO snapshot_items (id, embedding) VALUES (1, '[1,1,1]'), (2, '[2,2,2]'), (3, NULL)")
+        snapshot = Snapshot(str(tmp_path), dim=3)
+        assert snapshot.sync(conn.cursor(), 'snapshot_items', 'embedding') == 2
+
+        cur.execute("INSERT INTO snapshot_items (id, embedding) VALUES (4, '[4,4,4]')")
+        assert snapshot.sync(conn.cursor(), 'snapshot_items', 'embedding') == 1
+
+        snapshot = Snapshot(str(tmp_path))
+        assert np.array_equal(snapshot.ids, [1, 2, 4])
+        assert np.array_equal(snapshot.vectors, [[1, 1, 1], [2, 2, 2], [4, 4, 4]])
+        assert isinstance(snapshot.vectors, np.memmap)
+        assert snapshot.vectors.dtype == np.float32
+
+    def test_updated_at(self, tmp_path):
+        cur.execute("INSERT INTO snapshot_items (id, embedding) VALUES (1, '[1,1,1]'), (3, '[3,3,3]')")
+        snapshot = Snapshot(str(tmp_path), dim=3)
+        assert snapshot.sync(conn.cursor(), 'snapshot_items', 'embedding', updated_at='updated_at') == 2
+
+        cur.execute("UPDATE snapshot_items SET embedding = '[5,5,5]', updated_at = now() + interval '1 second' WHERE id = 3")
+        cur.execute("INSERT INTO snapshot_items (id, embedding, updated_at) VALUES (2, '[2,2,2]', now() + interval '1 second')")
+        # row 1 is at the watermark, so it is pulled again
+        assert snapshot.sync(conn.cursor(), 'snapshot_items', 'embedding', updated_at='updated_at') == 3
+
+        assert np.array_equal(snapshot.ids, [1, 2, 3])
+        assert np.array_equal(snapshot.get([3]), [[5, 5, 5]])
+
+    def test_overlap(self, tmp_path):
+        cur.execute("INSERT INTO snapshot_items (id, embedding) VALUES (1, '[1,1,1]')")
+        snapshot = Snapshot(str(tmp_path), dim=3)
+        snapshot.sync(conn.cursor(), 'snapshot_items', 'embedding', updated_at='updated_at')
+
+        # committed after the last sync, but with an earlier timestamp
+        cur.execute("INSERT INTO snapshot_items (id, embedding, updated_at) VALUES (2, '[2,2,2]', now() - interval '1 second')")
+        assert snapshot.sync(conn.cursor(), 'snapshot_items', 'embedding', updated_at='updated_at', overlap=timedelta(seconds=5)) == 2
+        assert np.array_equal(snapshot.ids, [1, 2])
+
+    def test_interrupted_append(self, tmp_path):
+        cur.execute("INSERT INTO snapshot_items (id, embedding) VALUES (1, '[1,1,1]')")
+        snapshot = Snapshot(str(tmp_path), dim=3)
+        snapshot.sync(conn.cursor(), 'snapshot_items', 'embedding')
+
+        # rows written before a crash, without their count in meta.json
+        with open(str(tmp_path / 'ids.i8'), 'ab') as f:
+            f.write(np.array([9], dtype='<i8').tobytes())
+        with open(str(tmp_path / 'vectors.f4'), 'ab') as f:
+            f.write(np.array([9, 9, 9], dtype='<f4').tobytes())
+
+        cur.execute("INSERT INTO snapshot_items (id, embedding) VALUES (2, '[2,2,2]')")
+        snapshot = Snapshot(str(tmp_path))
+        assert snapshot.sync(conn.cursor(), 'snapshot_items', 'embedding') == 1
+        assert np.array_equal(snapshot.ids, [1, 2])
+        assert np.array_equal(snapshot.vectors, [[1, 1, 1], [2, 2, 2]])
+
+    def test_rewrite(self, tmp_path, monkeypatch):
+        cur.execute("INSERT INTO snapshot_items (id, embedding) VALUES (2, '[2,2,2]')")
+        snapshot = Snapshot(str(tmp_path), dim=3)
+        snapshot.sync(conn.cursor(), 'snapshot_items', 'embedding', updated_at='updated_at')
+
+        # sorts before the synced row, so the files are rewritten
+        cur.execute("INSERT INTO snapshot_items (id, embedding, updated_at) VALUES (1, '[1,1,1]', now() + interval '1 second')")
+
+        def crash():
+            raise KeyboardInterrupt
+
+        monkeypatch.setattr(snapshot, '_write_meta', crash)
+        with pytest.raises(KeyboardInterrupt):
+            snapshot.sync(conn.cursor(), 'snapshot_items', 'embedding', updated_at='updated_at')
+
+        # the new files are not published until meta.json points at them
+        snapshot = Snapshot(str(tmp_path))
+        assert np.array_equal(snapshot.ids, [2])
+        assert np.array_equal(snapshot.vectors, [[2, 2, 2]])
+
+        assert snapshot.sync(conn.cursor(), 'snapshot_items', 'embedding', updated_at='updated_at') == 2
+        assert np.array_equal(snapshot.ids, [1, 2])
+        assert np.array_equal(snapshot.vectors, [[1, 1, 1], [2, 2, 2]])
+        assert sorted(os.listdir(str(tmp_path))) == ['ids.1.i8', 'meta.json', 'vectors.1.f4']
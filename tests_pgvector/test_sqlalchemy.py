@@ -1,5 +1,6 @@
 import numpy as np
-from pgvector.sqlalchemy import Vector
+from pgvector.utils import unpack_bits
+from pgvector.sqlalchemy import BitVector, RoutingSession, Vector, cached, enable_cache_invalidation, grouped_centroids, columnar
 import pytest
 from sqlalchemy import create_engine, inspect, select, text, MetaData, Table, Column, Index, Integer
 from sqlalchemy.exc import StatementError
@@ -22,9 +23,18 @@ class Item(Base):
     embedding = mapped_column(Vector(3))
 
 
+class BitItem(Base):
+    __tablename__ = 'orm_bit_item'
+
+    id = mapped_column(Integer, primary_key=True)
+    bits = mapped_column(BitVector(40))
+
+
 Base.metadata.drop_all(engine)
 Base.metadata.create_all(engine)
 
+enable_cache_invalidation(engine)
+
 
 def create_items():
     vectors = [
@@ -134,6 +144,14 @@ class TestSqlalchemy:
             items = session.scalars(select(Item).order_by(Item.embedding.cosine_distance([1, 1, 1])))
             assert [v.id for v in items] == [1, 2, 3]
 
+    def test_columnar(self):
+        create_items()
+        distance = Item.embedding.l2_distance([1, 1, 1])
+        with Session(engine) as session:
+            result = columnar(session, select(Item.id, distance, Item.embedding).order_by(distance), dim=3)
+            assert result.ids.tolist() == [1, 3, 2]
+            assert np.array_equal(result.embeddings, [[1, 1, 1], [1, 1, 2], [2, 2, 2]])
+
     def test_filter(self):
         create_items()
         with Session(engine) as session:
@@ -194,6 +212,13 @@ class TestSqlalchemy:
             sum = session.scalars(select(func.sum(Item.embedding))).first()
             assert np.array_equal(sum, np.array([5, 7, 9]))
 
+    def test_grouped_centroids(self):
+        create_items()
+        with Session(engine) as session:
+            labels, centroids = grouped_centroids(session, Item.id % 2, Item.embedding)
+            centroids = dict(zip(labels, centroids.tolist()))
+            assert centroids == {0: [2, 2, 2], 1: [1, 1, 1.5]}
+
     def test_bad_dimensions(self):
         item = Item(embedding=[1, 2])
         session = Session(engine)
@@ -215,6 +240,54 @@ class TestSqlalchemy:
         with pytest.raises(StatementError, match='dtype must be numeric'):
             session.commit()
 
+    def test_routing(self):
+        create_items()
+        replica = create_engine('postgresql+psycopg2://localhost/pgvector_python_test')
+        with RoutingSession(engine, replicas={'replica': replica}) as session:
+            stmt = select(Item).order_by(Item.embedding.l2_distance([1, 1, 1]))
+            assert session.get_bind(clause=stmt) is replica
+            assert session.get_bind(clause=select(Item)) is engine
+            assert [v.id for v in session.scalars(stmt)] == [1, 3, 2]
+
+    def test_routing_fallback(self):
+        create_items()
+        # nothing listens on this port
+        replica = create_engine('postgresql+psycopg2://localhost:1/pgvector_python_test')
+        with RoutingSession(engine, replicas={'replica': replica}) as session:
+            session.selector.lag = None
+            stmt = select(Item).order_by(Item.embedding.l2_distance([1, 1, 1]))
+            assert [v.id for v in session.scalars(stmt)] == [1, 3, 2]
+            assert session.selector.healthy() == []
+
+    def test_cached(self):
+        create_items()
+        stmt = select(Item.id).order_by(Item.embedding.l2_distance([1, 1, 1])).limit(2)
+        with Session(engine) as session:
+            assert [v.id for v in cached(session, stmt)] == [1, 3]
+            session.add(Item(id=4, embedding=[1, 1, 1.5]))
+            session.commit()
+            assert [v.id for v in cached(session, stmt)] == [1, 4]
+
+    def test_cached_rollback(self):
+        create_items()
+        stmt = select(Item.id).order_by(Item.embedding.l2_distance([1, 1, 1])).limit(2)
+        with Session(engine) as session:
+            session.add(Item(id=4, embedding=[1, 1, 1.5]))
+            session.flush()
+            assert [v.id for v in cached(session, stmt)] == [1, 4]
+            session.rollback()
+            assert [v.id for v in cached(session, stmt)] == [1, 3]
+
+    def test_bit_vector(self):
+        bits = np.random.randint(0, 2, 40)
+        with Session(engine) as session:
+            session.query(BitItem).delete()
+            session.add(BitItem(id=1, bits=bits))
+            session.commit()
+            item = session.get(BitItem, 1)
+            assert item.bits.dtype == np.int32
+            assert np.array_equal(unpack_bits(item.bits, 40), bits)
+
     def test_inspect(self):
         columns = inspect(engine).get_columns('orm_item')
         assert isinstance(columns[1]['type'], Vector)
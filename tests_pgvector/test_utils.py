@@ -0,0 +1,142 @@
+import numpy as np
+from pgvector.utils import InvalidVectorsError, PackedBits, VectorResult, get_codec, to_db_array_binary, to_db_binary, from_db_array_binary, from_db_batch, from_db_bits, hamming_distance, hamming_rerank, pack_bits, to_db_batch, to_db_bits, unpack_bits, validate_batch
+import pytest
+
+
+class TestUtils:
+    def test_validate_batch(self):
+        values = validate_batch([[1, 2, 3], [4, 5, 6]], dim=3)
+        assert values.dtype == np.float32
+        assert np.array_equal(values, [[1, 2, 3], [4, 5, 6]])
+
+    def test_validate_batch_dimensions(self):
+        with pytest.raises(InvalidVectorsError, match=r'expected 3 dimensions in rows \[1, 2\]') as error:
+            validate_batch([[1, 2, 3], [1, 2], [1]], dim=3)
+        assert error.value.rows == [1, 2]
+
+    def test_validate_batch_non_finite(self):
+        with pytest.raises(InvalidVectorsError, match=r'non-finite values in rows \[0, 2\]'):
+            validate_batch(np.array([[np.nan, 1], [1, 2], [np.inf, 1]]))
+
+    def test_validate_batch_ndim(self):
+        with pytest.raises(ValueError, match='expected ndim to be 2'):
+            validate_batch(np.array([1, 2, 3]))
+
+    def test_validate_batch_dtype(self):
+        with pytest.raises(ValueError, match='dtype must be numeric'):
+            validate_batch(np.array([['one', 'two']]))
+
+    def test_normalize(self):
+        values = validate_batch(np.array([[3, 4], [0, 2]]), normalize=True)
+        assert np.allclose(values, [[0.6, 0.8], [0, 1]])
+
+    def test_normalize_zero(self):
+        with pytest.raises(InvalidVectorsError, match=r'cannot normalize zero vectors in rows \[1\]'):
+            validate_batch([[1, 1], [0, 0]], normalize=True)
+
+    def test_to_db_batch(self):
+        assert to_db_batch(np.array([[1.5, 2, 3], [4, 5, 6]])) == ['[1.5,2,3]', '[4,5,6]']
+
+    def test_from_db_batch(self):
+        values = from_db_batch(['[1,2,3]', '[4,5,6]'])
+        assert values.dtype == np.float32
+        assert np.array_equal(values, [[1, 2, 3], [4, 5, 6]])
+        assert np.array_equal(from_db_batch([[1, 2], [3, 4]], dim=2), [[1, 2], [3, 4]])
+
+    def test_from_db_batch_ragged(self):
+        with pytest.raises(InvalidVectorsError, match=r'expected 2 dimensions in rows \[1, 2\]'):
+            from_db_batch(['[1,2]', '[3,4,5,6]', '[7,8,9]'], dim=3)
+        with pytest.raises(InvalidVectorsError, match=r'expected 2 dimensions in rows \[1\]'):
+            from_db_batch([[1, 2], [3, 4, 5]])
+
+    def test_array_binary(self):
+        value = from_db_array_binary(to_db_array_binary(np.array([1.5, 2, -3])))
+        assert value.dtype == np.float32
+        assert value.tolist() == [1.5, 2, -3]
+
+    def test_pack_bits(self):
+        bits = np.random.randint(0, 2, (10, 70))
+        packed = pack_bits(bits)
+        assert packed.shape == (10, 3)
+        assert packed.dtype == np.int32
+        assert np.array_equal(unpack_bits(packed, 70), bits)
+
+    def test_to_db_bits(self):
+        assert to_db_bits([1] + [0] * 31) == [-2147483648]
+        with pytest.raises(ValueError, match='expected 32 dimensions, not 2'):
+            to_db_bits([1, 0], 32)
+        # only PackedBits are taken as packed, whatever the dtype
+        assert to_db_bits(np.array([0, 1, 1, 0, 1, 0, 0, 0], dtype=np.int32)) == [1744830464]
+        assert to_db_bits(pack_bits([0, 1, 1, 0, 1, 0, 0, 0])) == [1744830464]
+
+    def test_from_db_bits(self):
+        value = from_db_bits([-2147483648, 16777216], 40)
+        assert value.dtype == np.int32
+        assert isinstance(value, PackedBits)
+        assert np.array_equal(unpack_bits(value, 40), [1] + [0] * 31 + [0] * 7 + [1])
+        assert np.array_equal(from_db_bits('{-2147483648,16777216}', 40), value)
+        # packed values go back unchanged
+        assert to_db_bits(value, 40) == [-2147483648, 16777216]
+        with pytest.raises(ValueError, match='expected 2 packed elements, not 1'):
+            from_db_bits([1], 40)
+
+    def test_rerank_decoded(self):
+        bits = np.random.randint(0, 2, (10, 64))
+        rows = [from_db_bits(to_db_bits(v), 64) for v in bits]
+        indices, distances = hamming_rerank(rows[0], rows, 3)
+        assert indices[0] == 0
+
+    def test_hamming_rerank(self):
+        bits = np.random.randint(0, 2, (100, 64))
+        packed = pack_bits(bits)
+        assert np.array_equal(hamming_distance(packed[0], packed), (bits != bits[0]).sum(axis=1))
+        indices, distances = hamming_rerank(packed[0], packed, 5)
+        assert indices[0] == 0
+        assert distances[0] == 0
+        assert np.all(np.diff(distances) >= 0)
+
+    def test_vector_result(self):
+        result = VectorResult.from_rows([(1, 0.5, '[1,2]'), (2, 1.5, '[3,4]')])
+        assert len(result) == 2
+        assert result.ids.tolist() == [1, 2]
+        assert result.distances.tolist() == [0.5, 1.5]
+        assert np.array_equal(result.embeddings, [[1, 2], [3, 4]])
+
+    def test_vector_result_null(self):
+        result = VectorResult.from_rows([(1, 0.5, '[1,2,3]'), (2, 0.7, None)], 3)
+        assert result.nulls.tolist() == [False, True]
+        assert result.embeddings[0].tolist() == [1, 2, 3]
+        assert np.isnan(result.embeddings[1]).all()
+
+    def test_from_db_batch_null(self):
+        values = from_db_batch([None, [1, 2]])
+        assert values.shape == (2, 2)
+        assert np.isnan(values[0]).all()
+        assert from_db_batch([None, None], dim=3).shape == (2, 3)
+
+    def test_vector_result_empty(self):
+        result = VectorResult.from_rows([], dim=3)
+        assert len(result) == 0
+        assert result.embeddings.shape == (0, 3)
+
+    def test_codec(self):
+        codec = get_codec(3)
+        assert codec is get_codec(3)
+        assert codec.to_db(np.array([1.5, 2, 3])) == '[1.5,2,3]'
+        assert codec.to_db([1, 2, 3]) == '[1,2,3]'
+        assert codec.to_db_binary([1.5, 2, 3]) == to_db_binary([1.5, 2, 3])
+        assert np.array_equal(codec.from_db('[1.5,2,3]'), [1.5, 2, 3])
+        assert np.array_equal(codec.from_db_binary(to_db_binary([1.5, 2, 3])), [1.5, 2, 3])
+        assert codec.to_db(None) is None
+        assert codec.from_db(None) is None
+
+    def test_codec_invalid(self):
+        codec = get_codec(3)
+        with pytest.raises(ValueError, match='expected 3 dimensions, not 2'):
+            codec.to_db([1, 2])
+        with pytest.raises(ValueError, match='expected ndim to be 1'):
+            codec.to_db(np.array([[1, 2, 3]]))
+        with pytest.raises(ValueError, match='dtype must be numeric'):
+            codec.to_db_binary(np.array(['one', 'two', 'three']))
+        with pytest.raises(ValueError, match='expected 3 dimensions, not 2'):
+            codec.from_db_binary(to_db_binary([1, 2]))